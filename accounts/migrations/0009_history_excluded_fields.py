@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:21
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_historicaluser_email_verified_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='historicaluser',
+            name='last_login',
+        ),
+        migrations.RemoveField(
+            model_name='historicaluser',
+            name='password',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:23
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_history_excluded_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicaluser',
+            name='changes',
+            field=models.JSONField(blank=True, editable=False, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True),
+        ),
+    ]
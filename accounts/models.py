@@ -1,7 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
-from simple_history.models import HistoricalRecords
+from core.history import HistoricalRecords
 from django.contrib.auth.models import BaseUserManager
 
 """Base user manager for the override of the username to all applications."""
@@ -139,5 +139,10 @@ class User(AbstractUser):
     class Meta:
         verbose_name = "User"
         verbose_name_plural = "Users"
+        indexes = [
+            models.Index(fields=["kyc_status"], name="user_kyc_status_idx"),
+            models.Index(fields=["role"], name="user_role_idx"),
+        ]
 
-    history = HistoricalRecords()
\ No newline at end of file
+    # every login bumps last_login, the hash has no business in an audit table
+    history = HistoricalRecords(excluded_fields=["password", "last_login"])
\ No newline at end of file
@@ -1,3 +1,107 @@
-from django.test import TestCase
+from decimal import Decimal
+from itertools import count
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import User
+from core.db import statement_timeout
+from core.testing import QueryBudgetMixin
+from loans.models import Application, LoanTypes
+
+serial = count()
+
+
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class DashboardQueryTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(email="customer@greenloan.local", password="pass")
+        cls.officer = User.objects.create_user(email="officer@greenloan.local", password="pass", role="officer")
+        cls.admin = User.objects.create_user(email="admin@greenloan.local", password="pass", role="admin")
+
+    def seed_applications(self, n, applicant=None):
+        for _ in range(n):
+            # a fresh applicant and loan type per row, so a missing select_related shows
+            i = next(serial)
+            loan_type = LoanTypes.objects.create(
+                name=f"Type {i}", description="test", interest_rate=Decimal("10"), amount_limit=Decimal("100000")
+            )
+            Application.objects.create(
+                applicant=applicant or User.objects.create_user(email=f"applicant{i}@example.com"),
+                loan_type=loan_type,
+                amount=Decimal("1000"),
+                duration_months=12,
+                purpose="test",
+                monthly_income=Decimal("5000"),
+                address="test",
+                citizenship_number=str(i),
+            )
+
+    def test_customer_dashboard(self):
+        self.client.force_login(self.customer)
+        self.assertQueryCountConstant(
+            reverse("accounts:dashboard"), lambda n: self.seed_applications(n, self.customer)
+        )
+
+    def test_officer_dashboard(self):
+        self.client.force_login(self.officer)
+        self.assertQueryCountConstant(reverse("accounts:dashboard"), self.seed_applications)
+
+    def test_admin_dashboard(self):
+        self.client.force_login(self.admin)
+        self.assertQueryCountConstant(reverse("accounts:dashboard"), self.seed_applications)
+
+    def test_kyc_applications(self):
+        def seed(n):
+            for _ in range(n):
+                User.objects.create_user(email=f"kyc{next(serial)}@example.com")
+
+        self.client.force_login(self.officer)
+        self.assertQueryCountConstant(reverse("accounts:kycapplication"), seed)
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage", VIEW_STATEMENT_TIMEOUT_MS=1500
+)
+class StatementTimeoutTests(TestCase):
+    def setUp(self):
+        self.statements = []
+
+    def record(self, execute, sql, params, many, context):
+        # SET / RESET are PostgreSQL only, record them without running them
+        if sql.startswith(("SET", "RESET")):
+            self.statements.append((sql, params))
+            return None
+        self.statements.append(("query", None))
+        return execute(sql, params, many, context)
+
+    def test_dashboard_runs_under_the_view_timeout(self):
+        self.client.force_login(User.objects.create_user(email="officer@greenloan.local", role="officer"))
+        with mock.patch.object(connection, "vendor", "postgresql"), connection.execute_wrapper(self.record):
+            response = self.client.get(reverse("accounts:dashboard"))
+
+        self.assertEqual(response.status_code, 200)
+        timeout = self.statements.index(("SET LOCAL statement_timeout = %s", [1500]))
+        # the view's queries, template rendering included, run after it
+        self.assertIn(("query", None), self.statements[timeout:])
+
+    def test_timeout_is_reset_outside_a_transaction(self):
+        with mock.patch.object(connection, "vendor", "postgresql"), \
+                mock.patch.object(connection, "in_atomic_block", False), \
+                connection.execute_wrapper(self.record):
+            with statement_timeout(200):
+                User.objects.exists()
+
+        self.assertEqual(
+            self.statements,
+            [("SET statement_timeout = %s", [200]), ("query", None), ("RESET statement_timeout", None)],
+        )
+
+    def test_other_backends_are_left_alone(self):
+        with connection.execute_wrapper(self.record), statement_timeout(200):
+            User.objects.exists()
+
+        self.assertEqual(self.statements, [("query", None)])
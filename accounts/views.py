@@ -6,6 +6,9 @@ from django.views.generic import CreateView, ListView, UpdateView, TemplateView,
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from accounts.models import User
 from loans.models import Application
+from core.db import StatementTimeoutMixin
+from core.rollups import portfolio_totals
+from kyc.face import register_reference_photo
 from .forms import (
     KYCUpdateForm,
     SimpleUserCreationForm,
@@ -19,8 +22,7 @@ from django.shortcuts import get_object_or_404
 from accounts.tokens import email_verification_token
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
-from django.core.mail import send_mail
-from django.conf import settings
+from core.outbox import queue_mail
 from django.utils.http import urlsafe_base64_decode
 
 
@@ -111,12 +113,10 @@ class EmailAddrVerify(View):
 
         Thank you!
         """
-        send_mail(
+        queue_mail(
             subject,
             message,
-            settings.DEFAULT_FROM_EMAIL,
             [user.email],
-            fail_silently=False
         )    
 
 class ResendEmailAddrVerify(View):
@@ -137,7 +137,7 @@ class ResendEmailAddrVerify(View):
         return redirect("accounts:login")
 
 
-class DashboardView(LoginRequiredMixin, TemplateView):
+class DashboardView(StatementTimeoutMixin, LoginRequiredMixin, TemplateView):
     # template_name = 'accounts/dashboard.html'
 
     def get_template_names(self):
@@ -154,19 +154,20 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         user = self.request.user
 
         if user.role in ["officer", "senior_officer", "admin"]:
+            totals = portfolio_totals()
             context.update(
                 {
-                    "applications": Application.objects.all()[:10],
+                    "applications": Application.objects.select_related("applicant", "loan_type")[:10],
                     "users": User.objects.all()[:10],
-                    "total_applications": Application.objects.count(),
-                    "pending_applications": Application.objects.filter(status="submitted").count(),
-                    "pending_reviews": Application.objects.exclude(status="approved").count()
+                    "total_applications": totals["applications_total"],
+                    "pending_applications": totals["applications_submitted"],
+                    "pending_reviews": totals["applications_total"] - totals["applications_approved"]
                 }
             )
         else:
             context.update(
                 {
-                    "applications": Application.objects.filter(applicant=user),
+                    "applications": Application.objects.filter(applicant=user).select_related("loan_type"),
                 }
             )
         return context
@@ -221,12 +222,15 @@ class ProfileView(LoginRequiredMixin, UpdateView):
 
                 user.save()
                 kyc_form.save()
+                if request.FILES.get("passport_photo"):
+                    # queue the reference face embedding for the KYC worker
+                    register_reference_photo(user, user.passport_photo_url)
                 messages.success(request, "KYC updated successfully.")
                 return redirect(self.success_url)
         return self.get(request, *args, **kwargs)
 
 
-class KYCListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class KYCListView(StatementTimeoutMixin, LoginRequiredMixin, UserPassesTestMixin, ListView):
     model = User
     template_name = "accounts/kycapplication.html"
     context_object_name = "kyc_applications"
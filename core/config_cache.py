@@ -0,0 +1,92 @@
+"""
+Cache for near-static configuration rows: SitePage and LoanTypes.
+
+Reads go through a small per-process LRU with a short TTL, then Django's
+cache framework, then the database. Saving or deleting a row drops both
+levels in the saving process (core.signals), other processes may serve their
+local copy for up to CONFIG_CACHE_LOCAL_TTL seconds after a change. That only
+holds when the cache is shared between them (gunicorn.conf.py sets a shared
+CACHE_URL): a per-process locmem cache is never invalidated from elsewhere,
+so with it rows are kept for CONFIG_CACHE_LOCAL_TTL as well.
+
+Cached instances are shared between requests, treat them as read-only.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from core.models import SitePage
+from loans.models import LoanTypes
+
+LOCAL_MAX_ENTRIES = 32
+
+_MISSING = object()
+_local = OrderedDict()
+_lock = threading.Lock()
+
+
+def _cache_key(key):
+    return f"config:{key}"
+
+
+def shared_timeout():
+    if isinstance(caches["default"], LocMemCache):
+        # private to this process like the local copy, so no longer-lived than it
+        return min(settings.CONFIG_CACHE_TIMEOUT, settings.CONFIG_CACHE_LOCAL_TTL)
+    return settings.CONFIG_CACHE_TIMEOUT
+
+
+def get_config(key, loader):
+    now = time.monotonic()
+    with _lock:
+        entry = _local.get(key)
+        if entry is not None and entry[0] > now:
+            _local.move_to_end(key)
+            return entry[1]
+
+    value = cache.get(_cache_key(key), _MISSING)
+    if value is _MISSING:
+        value = loader()
+        cache.set(_cache_key(key), value, shared_timeout())
+
+    with _lock:
+        _local[key] = (now + settings.CONFIG_CACHE_LOCAL_TTL, value)
+        _local.move_to_end(key)
+        while len(_local) > LOCAL_MAX_ENTRIES:
+            _local.popitem(last=False)
+    return value
+
+
+def invalidate(*keys):
+    cache.delete_many([_cache_key(key) for key in keys])
+    with _lock:
+        for key in keys:
+            _local.pop(key, None)
+
+
+def site_settings():
+    """The SitePage row, or None before one is saved."""
+    return get_config("site_page", lambda: SitePage.objects.first())
+
+
+def _load_loan_types():
+    loan_types = list(LoanTypes.objects.all())
+    for loan_type in loan_types:
+        # the settings page edits them as JSON
+        loan_type.documents_json = json.dumps(loan_type.required_documents)
+    return loan_types
+
+
+def loan_types():
+    """Every loan type, ordered by name."""
+    return get_config("loan_types", _load_loan_types)
+
+
+def active_loan_types():
+    return [loan_type for loan_type in loan_types() if loan_type.is_active]
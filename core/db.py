@@ -0,0 +1,54 @@
+"""
+Per-view statement timeouts.
+
+Views that run open-ended report queries use StatementTimeoutMixin to cap
+their statements at settings.VIEW_STATEMENT_TIMEOUT_MS, so a runaway query
+is cancelled by the server instead of holding a worker until gunicorn kills
+it. Other backends ignore the timeouts.
+"""
+
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@contextmanager
+def statement_timeout(ms, using=DEFAULT_DB_ALIAS):
+    """Cap the statements run inside the block at `ms` milliseconds (0 or None: no change)."""
+    connection = connections[using]
+    if not ms or connection.vendor != "postgresql":
+        yield
+        return
+
+    if connection.in_atomic_block:
+        # lasts until the enclosing transaction ends, RESET could not run in
+        # a transaction the timeout itself aborted
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL statement_timeout = %s", [int(ms)])
+        yield
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SET statement_timeout = %s", [int(ms)])
+    try:
+        yield
+    finally:
+        # back to the connection's default (DB_STATEMENT_TIMEOUT_MS, off unless
+        # set), the connection is reused by the next request
+        with connection.cursor() as cursor:
+            cursor.execute("RESET statement_timeout")
+
+
+class StatementTimeoutMixin:
+    """Runs the view, template rendering included, under a statement timeout."""
+
+    statement_timeout_setting = "VIEW_STATEMENT_TIMEOUT_MS"
+
+    def dispatch(self, request, *args, **kwargs):
+        with statement_timeout(getattr(settings, self.statement_timeout_setting)):
+            response = super().dispatch(request, *args, **kwargs)
+            # template responses render lazily, their querysets run here
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+        return response
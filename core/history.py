@@ -0,0 +1,70 @@
+"""
+simple_history setup shared by every model.
+
+Models pass `excluded_fields` for columns not worth a history copy: the
+password hash, timestamps bumped on every save and large JSON. A save that
+only touches excluded fields (update_last_login, a bare auto_now bump) then
+writes no history row at all. Old rows are thinned out with
+`manage.py compact_history`.
+
+Every historical table also has a `changes` column. With
+settings.AUDIT_STORE_DIFFS on, the diff against the previous version is
+computed once when the row is written, so the audit log only reads it back.
+Rows written by the bulk helpers, or before the setting was on, keep it
+empty and the audit log diffs them on the fly (see diff_records).
+"""
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.dispatch import receiver
+from simple_history.models import HistoricalRecords as BaseHistoricalRecords
+from simple_history.signals import pre_create_historical_record
+
+
+class HistoricalChanges(models.Model):
+    changes = models.JSONField(null=True, blank=True, editable=False, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        abstract = True
+
+
+class HistoricalRecords(BaseHistoricalRecords):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("bases", (HistoricalChanges,))
+        super().__init__(*args, **kwargs)
+
+    def post_save(self, instance, created, using=None, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if not created and update_fields and set(update_fields) <= set(self.excluded_fields):
+            return
+        super().post_save(instance, created, using=using, **kwargs)
+
+
+def diff_records(old, new):
+    """Changed tracked fields between two versions, foreign keys as ids so nothing is fetched."""
+    if old is None:
+        return []
+    changes = []
+    for field in new.tracked_fields:
+        before = getattr(old, field.attname)
+        after = getattr(new, field.attname)
+        if before != after:
+            changes.append({
+                "field": field.name,
+                "old": None if before is None else str(before),
+                "new": None if after is None else str(after),
+            })
+    return changes
+
+
+@receiver(pre_create_historical_record)
+def store_changes(sender, instance, history_instance, **kwargs):
+    if not settings.AUDIT_STORE_DIFFS:
+        return
+    previous = (
+        sender.objects.filter(**{instance._meta.pk.attname: instance.pk})
+        .order_by("-history_id")
+        .first()
+    )
+    history_instance.changes = diff_records(previous, history_instance)
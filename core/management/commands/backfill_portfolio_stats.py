@@ -0,0 +1,67 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+from core.models import DailyPortfolioStat
+from core.rollups import column
+from loans.models import Application, ApprovedLoans
+from payments.models import Payment
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailyPortfolioStat rollup from the transactional tables."
+
+    def handle(self, *args, **options):
+        days = defaultdict(lambda: defaultdict(int))
+
+        def add(day, name, value):
+            if name:
+                days[day][name] += value
+
+        applications = (
+            Application.objects.annotate(day=TruncDate("created_at"))
+            .order_by()
+            .values("day", "status")
+            .annotate(n=Count("id"))
+        )
+        for row in applications:
+            add(row["day"], "applications_total", row["n"])
+            add(row["day"], column("applications", row["status"]), row["n"])
+
+        loans = ApprovedLoans.objects.order_by().values("approved_at", "status").annotate(n=Count("id"))
+        for row in loans:
+            add(row["approved_at"], "loans_approved", row["n"])
+            add(row["approved_at"], column("loans", row["status"]), row["n"])
+
+        users = (
+            User.objects.annotate(day=TruncDate("date_joined"))
+            .order_by()
+            .values("day", "role", "kyc_status")
+            .annotate(n=Count("id"))
+        )
+        for row in users:
+            if row["role"] != "customer":
+                add(row["day"], "staff_users", row["n"])
+            add(row["day"], column("kyc", row["kyc_status"]), row["n"])
+
+        payments = (
+            Payment.objects.annotate(day=TruncDate("paid_at"))
+            .order_by()
+            .values("day")
+            .annotate(total=Sum("amount"))
+        )
+        for row in payments:
+            add(row["day"], "revenue_collected", row["total"])
+
+        stats = [DailyPortfolioStat(date=day, **counters) for day, counters in sorted(days.items())]
+        with transaction.atomic():
+            DailyPortfolioStat.objects.all().delete()
+            DailyPortfolioStat.objects.bulk_create(stats, batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(stats)} daily portfolio rows."))
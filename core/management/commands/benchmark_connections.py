@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections
+
+from accounts.models import User
+
+MODES = {
+    # name: (CONN_MAX_AGE, CONN_HEALTH_CHECKS)
+    "new connection": (0, False),
+    "persistent": (None, False),
+    "persistent + health check": (None, True),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the database connection overhead per request: simulated requests (the "
+        "request_started / request_finished signals that open and close connections around "
+        "a couple of queries) with a new connection per request, a persistent one, and a "
+        "persistent one health-checked at the start of each request. Meant for PostgreSQL, "
+        "where connecting costs a TCP round trip, authentication and a backend fork."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--queries", type=int, default=2, help="queries per request")
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if connection.in_atomic_block:
+            raise CommandError("Run outside a transaction, connections are closed between requests.")
+        original = {key: connection.settings_dict[key] for key in ("CONN_MAX_AGE", "CONN_HEALTH_CHECKS")}
+        self.stdout.write(f"{connection.vendor}, {options['requests']} requests of {options['queries']} queries")
+
+        results = {}
+        try:
+            for name, (max_age, health_checks) in MODES.items():
+                # the settings are read when the connection opens
+                connection.close()
+                connection.settings_dict["CONN_MAX_AGE"] = max_age
+                connection.settings_dict["CONN_HEALTH_CHECKS"] = health_checks
+                self.run(options["database"], 20, options["queries"])  # warm up
+                results[name] = self.run(options["database"], options["requests"], options["queries"])
+        finally:
+            connection.close()
+            connection.settings_dict.update(original)
+
+        baseline = results["persistent"]
+        for name, seconds in results.items():
+            self.stdout.write(f"{name:<26} {seconds * 1e3:8.3f} ms/request ({(seconds - baseline) * 1e3:+.3f} ms)")
+
+    def run(self, database, requests, queries):
+        users = User.objects.using(database)
+        start = time.perf_counter()
+        for _ in range(requests):
+            request_started.send(sender=self.__class__)
+            for _ in range(queries):
+                users.filter(pk=0).exists()
+            request_finished.send(sender=self.__class__)
+        return (time.perf_counter() - start) / requests
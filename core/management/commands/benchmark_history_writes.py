@@ -0,0 +1,83 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import update_last_login
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import User
+from core.management.commands.compact_history import history_models
+from loans.models import Application, ApprovedLoans, LoanTypes
+from loans.utils import create_repayments
+from payments.services import allocate_payment
+
+
+class Command(BaseCommand):
+    help = (
+        "Count the history rows (and history columns written) by one login, one "
+        "loan approval and consecutive payments."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tenure", type=int, default=24)
+        parser.add_argument("--payments", type=int, default=3)
+
+    def measure(self, label, action):
+        tables = [history_model for _, history_model in history_models()]
+        before = {table: table.objects.count() for table in tables}
+        action()
+        rows = {table: table.objects.count() - before[table] for table in tables}
+
+        written = {table: count for table, count in rows.items() if count}
+        cells = sum(count * len(table._meta.concrete_fields) for table, count in written.items())
+        detail = ", ".join(f"{table.__name__} {count}" for table, count in written.items()) or "-"
+        self.stdout.write(f"{label:<12} {sum(written.values()):>4} rows {cells:>6} cells  ({detail})")
+
+    def handle(self, *args, **options):
+        # everything is rolled back, the benchmark never leaves rows behind
+        with transaction.atomic():
+            officer = User.objects.create_user(email="benchmark-officer@greenloan.local", role="senior_officer")
+            customer = User.objects.create_user(email="benchmark-customer@greenloan.local", role="customer")
+            loan_type = LoanTypes.objects.create(
+                name="Benchmark Loan",
+                description="benchmark",
+                interest_rate=Decimal("12.00"),
+                amount_limit=Decimal("10000000"),
+            )
+            application = Application.objects.create(
+                applicant=customer,
+                loan_type=loan_type,
+                amount=Decimal("100000"),
+                duration_months=options["tenure"],
+                purpose="benchmark",
+                monthly_income=Decimal("100000"),
+                address="benchmark",
+                citizenship_number="0000",
+                status="final_review",
+            )
+
+            self.measure("login", lambda: update_last_login(None, customer))
+
+            def approve():
+                # same writes as ApplicationStatusUpdateView
+                application.status = "approved"
+                application.save()
+                loan = ApprovedLoans.objects.create(
+                    application=application,
+                    principle=application.amount,
+                    interest_rate=loan_type.interest_rate,
+                    tenure_months=application.duration_months,
+                    approved_by=officer,
+                    status="active",
+                )
+                create_repayments(loan)
+
+            self.measure("approval", approve)
+
+            repayments = list(application.approvedloans_set.get().repayments.order_by("due_date"))
+            for i in range(options["payments"]):
+                self.measure(
+                    f"payment {i + 1}",
+                    lambda: allocate_payment(customer, [repayments[i].id], None, "cash"),
+                )
+
+            transaction.set_rollback(True)
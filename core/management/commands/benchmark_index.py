@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+SCENARIOS = [
+    ("no cache", {"PAGE_CACHE_TIMEOUT": 0, "FRAGMENT_CACHE_TIMEOUT": 0}),
+    ("fragments", {"PAGE_CACHE_TIMEOUT": 0}),
+    ("full page", {}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Request the public index as an anonymous visitor through the full middleware "
+        "stack and report requests/sec without caching, with fragment caching only "
+        "(what visitors with a session get) and with the full-page cache. Needs "
+        "collectstatic (or DEBUG) for the static tags."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+
+    def handle(self, *args, **options):
+        client = Client(HTTP_HOST=next(host for host in settings.ALLOWED_HOSTS if host != "*"))
+        url = reverse("core:index")
+        count = options["requests"]
+
+        for label, overrides in SCENARIOS:
+            with override_settings(**overrides):
+                cache.clear()
+                client.get(url)  # warm up: config cache, fragments, page
+
+                start = time.perf_counter()
+                for _ in range(count):
+                    response = client.get(url)
+                elapsed = time.perf_counter() - start
+
+            self.stdout.write(
+                f"{label:<10} {count / elapsed:8.0f} req/s  {elapsed / count * 1000:7.2f} ms/request"
+                f"  ({len(response.content) // 1024} KB)"
+            )
+        cache.clear()
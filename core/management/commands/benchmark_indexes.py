@@ -0,0 +1,179 @@
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Case, IntegerField, Value, When
+
+from accounts.models import User
+from loans.models import Application, ApprovedLoans, Document, LoanTypes, Repayment
+
+# the indexes added for the view queries below (accounts 0011, loans 0025/0026)
+INDEXES = [
+    (User, "user_kyc_status_idx"),
+    (User, "user_role_idx"),
+    (Application, "application_applicant_idx"),
+    (Application, "application_created_idx"),
+    (ApprovedLoans, "loan_latest_per_app_idx"),
+    (Repayment, "repayment_schedule_idx"),
+]
+KYC_STATUSES = ["pending", "submitted", "verified", "rejected"]
+STAFF_ROLES = ["officer", "senior_officer", "admin"]
+DOCUMENT_TYPES = ["citizenship_front", "salary_slip", "bank_statement", "id_proof"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway dataset, then print the EXPLAIN plan and average time of the "
+        "dashboard, KYC, user list, upload and repayment queries without and with the "
+        "query indexes. Everything is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--customers", type=int, default=2000)
+        parser.add_argument("--applications", type=int, default=3, help="applications per customer")
+        parser.add_argument("--runs", type=int, default=50)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            customer, application, loan = self.seed(options["customers"], options["applications"])
+            queries = self.queries(customer, application, loan)
+
+            self.execute_ddl("remove_sql")
+            before = self.run(queries, options["runs"], "without indexes")
+            self.execute_ddl("create_sql")
+            after = self.run(queries, options["runs"], "with indexes")
+
+            self.stdout.write(f"\n{'ms/query':<20} {'without':>8}  {'with':>8}")
+            for label in queries:
+                self.stdout.write(f"{label:<20} {before[label]:8.3f}  {after[label]:8.3f}")
+
+            transaction.set_rollback(True)
+
+    def execute_ddl(self, method):
+        # plain statements: SQLite refuses a schema editor inside a transaction
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for model, name in INDEXES:
+                index = next(index for index in model._meta.indexes if index.name == name)
+                cursor.execute(str(getattr(index, method)(model, editor)))
+
+    def seed(self, customers, per_customer):
+        self.stdout.write(f"seeding {customers} customers x {per_customer} applications ...")
+        officer = User.objects.create_user(email="benchmark-officer@greenloan.local", role="senior_officer")
+        loan_type = LoanTypes.objects.create(
+            name="Benchmark Loan", description="benchmark", interest_rate=Decimal("12"), amount_limit=Decimal("10000000")
+        )
+        users = User.objects.bulk_create(
+            [
+                User(
+                    email=f"benchmark{i}@greenloan.local",
+                    password="!",
+                    role=STAFF_ROLES[i % 3] if i % 50 == 0 else "customer",
+                    kyc_status=KYC_STATUSES[i % 4],
+                )
+                for i in range(customers)
+            ],
+            batch_size=1000,
+        )
+        applications = Application.objects.bulk_create(
+            [
+                Application(
+                    applicant=user,
+                    loan_type=loan_type,
+                    amount=Decimal("100000"),
+                    duration_months=12,
+                    purpose="benchmark",
+                    monthly_income=Decimal("50000"),
+                    address="benchmark",
+                    citizenship_number="0000",
+                    status="approved",
+                )
+                for user in users
+                for _ in range(per_customer)
+            ],
+            batch_size=1000,
+        )
+        Document.objects.bulk_create(
+            [
+                Document(application=application, document_type=document_type, file="documents/benchmark.pdf")
+                for application in applications
+                for document_type in DOCUMENT_TYPES
+            ],
+            batch_size=1000,
+        )
+        loans = ApprovedLoans.objects.bulk_create(
+            [
+                ApprovedLoans(
+                    application=application,
+                    principle=application.amount,
+                    interest_rate=Decimal("12"),
+                    tenure_months=12,
+                    approved_by=officer,
+                    status="active",
+                )
+                for application in applications
+            ],
+            batch_size=1000,
+        )
+        first_due = date.today()
+        Repayment.objects.bulk_create(
+            [
+                Repayment(
+                    loan=loan,
+                    due_date=first_due + timedelta(days=30 * month),
+                    amount_due=Decimal("9000"),
+                    status="paid" if month < 4 else "pending",
+                )
+                for loan in loans
+                for month in range(12)
+            ],
+            batch_size=2000,
+        )
+        if connection.vendor in ("postgresql", "sqlite"):
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+        return users[-1], applications[-1], loans[-1]
+
+    def queries(self, customer, application, loan):
+        return {
+            "customer dashboard": lambda: Application.objects.filter(applicant=customer).select_related("loan_type"),
+            "staff dashboard": lambda: Application.objects.select_related("applicant", "loan_type")[:10],
+            "kyc list": lambda: User.objects.filter(kyc_status="submitted")[:10],
+            "user list by role": lambda: User.objects.filter(role="senior_officer")[:10],
+            "upload documents": lambda: application.documents.filter(
+                document_type="salary_slip", is_additional=True
+            ),
+            "repayment list": lambda: loan.repayments.annotate(
+                status_order=Case(
+                    When(status="pending", then=Value(0)),
+                    When(status="late", then=Value(1)),
+                    When(status="paid", then=Value(2)),
+                    default=Value(3),
+                    output_field=IntegerField(),
+                )
+            ).order_by("status_order", "due_date"),
+            "pending repayments": lambda: loan.repayments.filter(status="pending"),
+            "latest loans": lambda: ApprovedLoans.objects.filter(
+                application__applicant=customer
+            ).latest_per_application(),
+        }
+
+    def explain(self, queryset):
+        # QuerySet.explain() mangles the wrapped window-function query on SQLite
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+
+    def run(self, queries, runs, title):
+        self.stdout.write(f"\n== {title} ==")
+        timings = {}
+        for label, build in queries.items():
+            self.stdout.write(f"-- {label}\n{self.explain(build())}")
+            start = time.perf_counter()
+            for _ in range(runs):
+                list(build())
+            timings[label] = (time.perf_counter() - start) / runs * 1000
+        return timings
@@ -0,0 +1,68 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+
+from core.metrics import RequestMetricsMiddleware, registry
+
+METRICS_MIDDLEWARE = "core.metrics.RequestMetricsMiddleware"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the cost of the request metrics middleware: around a view that does nothing, "
+        "and on the uncached index page through the full middleware stack, with and without it. "
+        "Needs collectstatic (or DEBUG) for the static tags."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=100000, help="calls around the empty view")
+        parser.add_argument("--requests", type=int, default=500, help="index page requests per run")
+
+    def handle(self, *args, **options):
+        # page requests first: the timers are only installed once the middleware is loaded
+        host = next(host for host in settings.ALLOWED_HOSTS if host != "*")
+        without = [name for name in settings.MIDDLEWARE if name != METRICS_MIDDLEWARE]
+        with override_settings(PAGE_CACHE_TIMEOUT=0):
+            with override_settings(MIDDLEWARE=without):
+                baseline = self.pages(Client(HTTP_HOST=host), options["requests"])
+            with override_settings(MIDDLEWARE=[METRICS_MIDDLEWARE, *without], METRICS_ENABLED=True):
+                measured = self.pages(Client(HTTP_HOST=host), options["requests"])
+
+        calls = options["calls"]
+        request = RequestFactory().get("/")
+        request.resolver_match = None
+
+        def view(request):
+            return HttpResponse()
+
+        middleware = RequestMetricsMiddleware(view)
+        bare = self.time_calls(view, request, calls)
+        wrapped = self.time_calls(middleware, request, calls)
+        registry.reset()
+
+        self.stdout.write(f"empty view    {bare * 1e6:8.2f} us/call, with metrics {wrapped * 1e6:8.2f} us/call "
+                          f"(+{(wrapped - bare) * 1e6:.2f} us)")
+        self.stdout.write(f"index page    {baseline * 1e3:8.3f} ms/request, with metrics {measured * 1e3:8.3f} ms/request "
+                          f"({(measured - baseline) / baseline:+.1%})")
+
+    def time_calls(self, func, request, calls):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func(request)
+        return (time.perf_counter() - start) / calls
+
+    def pages(self, client, count):
+        url = reverse("core:index")
+        client.get(url)  # warm up
+        # best of three, the page times are noisy
+        runs = []
+        for _ in range(3):
+            start = time.perf_counter()
+            for _ in range(count):
+                client.get(url)
+            runs.append((time.perf_counter() - start) / count)
+        return min(runs)
@@ -0,0 +1,98 @@
+import socketserver
+import threading
+import time
+
+from django.core.mail import get_connection, send_mail
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import EmailOutbox
+from core.outbox import send_batch
+
+
+class SMTPSink(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: accepts and discards every message."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 localhost sink")
+        for line in self.rfile:
+            verb = line[:4].upper()
+            if verb == b"DATA":
+                self.reply("354 end data with <CR><LF>.<CR><LF>")
+                for data in self.rfile:
+                    if data == b".\r\n":
+                        break
+                with self.server.lock:
+                    self.server.received += 1
+                self.reply("250 queued")
+            elif verb == b"QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue N mails and drain them through the outbox sender into a local SMTP "
+        "sink, next to the old one-connection-per-mail send_mail for comparison."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=10000)
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--baseline", type=int, default=500, help="Mails sent with plain send_mail.")
+
+    def handle(self, *args, **options):
+        server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SMTPSink)
+        server.daemon_threads = True
+        server.lock = threading.Lock()
+        server.received = 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+
+        def connection():
+            return get_connection(
+                "django.core.mail.backends.smtp.EmailBackend",
+                host=host, port=port, username="", password="", use_tls=False, use_ssl=False,
+            )
+
+        try:
+            start = time.perf_counter()
+            for i in range(options["baseline"]):
+                send_mail("Benchmark", "body", "bench@greenloan.local", [f"user{i}@example.com"], connection=connection())
+            self.report("send_mail", options["baseline"], time.perf_counter() - start)
+
+            # everything is rolled back, the benchmark never leaves rows behind
+            with transaction.atomic():
+                start = time.perf_counter()
+                EmailOutbox.objects.bulk_create(
+                    [
+                        EmailOutbox(subject="Benchmark", body="body", from_email="bench@greenloan.local", recipients=[f"user{i}@example.com"])
+                        for i in range(options["count"])
+                    ],
+                    batch_size=1000,
+                )
+                self.report("queue", options["count"], time.perf_counter() - start)
+
+                start = time.perf_counter()
+                delivered = 0
+                while True:
+                    sent, failed = send_batch(options["batch_size"], connection=connection())
+                    if not sent and not failed:
+                        break
+                    delivered += sent
+                self.report("outbox", delivered, time.perf_counter() - start)
+
+                transaction.set_rollback(True)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.stdout.write(f"sink received {server.received} messages")
+
+    def report(self, label, count, seconds):
+        self.stdout.write(f"{label:<10} {count:>6} mails  {seconds:8.2f} s  {count / seconds:9.0f} mails/s")
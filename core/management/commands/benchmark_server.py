@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SERVERS = {
+    "runserver": lambda port: [sys.executable, "manage.py", "runserver", "--noreload", f"127.0.0.1:{port}"],
+    "gunicorn": lambda port: [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}"],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Start each server in turn (manage.py runserver, gunicorn with gunicorn.conf.py) and "
+        "load one URL with concurrent clients, reporting requests/sec and latency percentiles. "
+        "GUNICORN_* variables apply to the gunicorn run. Needs collectstatic when DEBUG is off."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--servers", nargs="+", default=list(SERVERS))
+        parser.add_argument("--url", default="/")
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--port", type=int, default=8765)
+
+    def handle(self, *args, **options):
+        unknown = set(options["servers"]) - set(SERVERS)
+        if unknown:
+            raise CommandError(f"Unknown servers: {', '.join(sorted(unknown))}")
+
+        for name in options["servers"]:
+            port = options["port"]
+            url = f"http://127.0.0.1:{port}{options['url']}"
+            process = subprocess.Popen(
+                SERVERS[name](port),
+                cwd=settings.BASE_DIR,
+                env=os.environ.copy(),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                self.wait_until_up(url, process)
+                self.load(url, options["concurrency"], 50)  # warm up
+                elapsed, latencies, errors = self.load(url, options["concurrency"], options["requests"])
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+            latencies.sort()
+            self.stdout.write(
+                f"{name:<10} {len(latencies) / elapsed:8.0f} req/s"
+                f"  p50 {latencies[len(latencies) // 2] * 1000:7.1f} ms"
+                f"  p95 {latencies[int(len(latencies) * 0.95)] * 1000:7.1f} ms"
+                f"  errors {errors}"
+            )
+
+    def wait_until_up(self, url, process):
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"Server exited with {process.returncode}")
+            try:
+                urllib.request.urlopen(url, timeout=5).read()
+                return
+            except (URLError, ConnectionError):
+                time.sleep(0.2)
+        raise CommandError(f"{url} did not come up")
+
+    def load(self, url, concurrency, count):
+        def fetch(_):
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    response.read()
+                return time.perf_counter() - start
+            except (URLError, ConnectionError):
+                return None
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(fetch, range(count)))
+        elapsed = time.perf_counter() - start
+        latencies = [result for result in results if result is not None]
+        return elapsed, latencies, len(results) - len(latencies)
@@ -0,0 +1,73 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# runs in a fresh interpreter so nothing is already imported
+PROBE = """
+import importlib, json, resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+for module in sys.argv[1:]:
+    importlib.import_module(module)
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "tensorflow": "tensorflow" in sys.modules,
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure import time and peak RSS of django.setup() plus URLconf loading, "
+        "as every web worker, migrate and test run pays it. --eager also imports "
+        "DeepFace, which is what loading the URLconf used to do."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+
+    def probe(self, modules, runs):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "greenloan.settings")}
+        samples = []
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, "-c", PROBE, *modules],
+                cwd=settings.BASE_DIR,
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+            if output.returncode:
+                return None, output.stderr.strip().splitlines()[-1]
+            samples.append(json.loads(output.stdout.strip().splitlines()[-1]))
+        return samples, None
+
+    def report(self, label, samples):
+        seconds = statistics.median(s["seconds"] for s in samples)
+        rss = statistics.median(s["rss_mb"] for s in samples)
+        tensorflow = "yes" if samples[0]["tensorflow"] else "no"
+        self.stdout.write(f"{label:<8} {seconds:8.3f} s  {rss:8.1f} MB  tensorflow loaded: {tensorflow}")
+
+    def handle(self, *args, **options):
+        runs = options["runs"]
+
+        lazy, error = self.probe([], runs)
+        if error:
+            self.stderr.write(f"startup failed: {error}")
+            return
+        self.report("lazy", lazy)
+
+        eager, error = self.probe(["deepface.DeepFace"], runs)
+        if error:
+            self.stdout.write(f"eager    skipped, DeepFace not importable here ({error})")
+        else:
+            self.report("eager", eager)
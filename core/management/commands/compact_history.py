@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.audit import with_previous_version
+from core.history import diff_records
+
+PERIODS = {
+    "day": lambda d: d.date(),
+    "week": lambda d: d.isocalendar()[:2],
+    "month": lambda d: (d.year, d.month),
+}
+
+
+def history_models(labels=None):
+    """(model, historical model) pairs for every model tracked by simple_history."""
+    models = [apps.get_model(label) for label in labels] if labels else apps.get_models()
+    for model in models:
+        manager = getattr(model._meta, "simple_history_manager_attribute", None)
+        if manager:
+            yield model, getattr(model, manager).model
+        elif labels:
+            raise CommandError(f"{model._meta.label} has no history")
+
+
+def restate_changes(history_model, history_ids):
+    """Re-diff the stored changes of these versions against their (new) previous versions."""
+    rows = list(with_previous_version(history_model.objects.filter(history_id__in=history_ids, changes__isnull=False)))
+    previous = history_model.objects.in_bulk([row.prev_history_id for row in rows if row.prev_history_id])
+    for row in rows:
+        row.changes = diff_records(previous.get(row.prev_history_id), row)
+    history_model.objects.bulk_update(rows, ["changes"])
+
+
+class Command(BaseCommand):
+    help = (
+        "Collapse history older than --keep-days into one snapshot per object per "
+        "period: the last version of each period is kept, the versions before it "
+        "in the same period are deleted and its stored diff is recomputed against "
+        "the version now before it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep-days", type=int, default=90, help="Leave recent history untouched.")
+        parser.add_argument("--period", choices=PERIODS, default="month")
+        parser.add_argument("--models", nargs="+", metavar="APP.MODEL", help="Defaults to every tracked model.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["keep_days"])
+        bucket = PERIODS[options["period"]]
+        batch_size = options["batch_size"]
+
+        for model, history_model in history_models(options["models"]):
+            object_id = model._meta.pk.attname
+            rows = (
+                history_model.objects.filter(history_date__lt=cutoff)
+                .order_by(object_id, "history_date", "history_id")
+                .values_list("history_id", object_id, "history_date")
+            )
+
+            # rows come ordered per object and date, so each row supersedes the
+            # previous one when both fall in the same period; superseded maps
+            # each surviving version to the versions of its period it replaces
+            superseded = {}
+            previous_key = previous_id = None
+            for history_id, pk, history_date in rows.iterator(chunk_size=batch_size):
+                key = (pk, bucket(timezone.localtime(history_date)))
+                if key == previous_key:
+                    doomed = superseded.pop(previous_id, [])
+                    doomed.append(previous_id)
+                    superseded[history_id] = doomed
+                previous_key, previous_id = key, history_id
+
+            if not options["dry_run"]:
+                survivors = list(superseded)
+                for start in range(0, len(survivors), batch_size):
+                    batch = survivors[start:start + batch_size]
+                    doomed = [history_id for survivor in batch for history_id in superseded[survivor]]
+                    with transaction.atomic():
+                        for offset in range(0, len(doomed), batch_size):
+                            history_model.objects.filter(
+                                history_id__in=doomed[offset:offset + batch_size]
+                            ).delete()
+                        # a stored diff (AUDIT_STORE_DIFFS) still describes a deleted predecessor
+                        restate_changes(history_model, batch)
+
+            verb = "Would delete" if options["dry_run"] else "Deleted"
+            count = sum(len(doomed) for doomed in superseded.values())
+            self.stdout.write(f"{history_model._meta.label}: {verb} {count} rows")
@@ -0,0 +1,358 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from datetime import time as clock
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import User
+from kyc.models import KYCVerification
+from loans.models import (
+    Application,
+    ApplicationEvent,
+    ApprovedLoans,
+    CreditScore,
+    Document,
+    LoanTypes,
+    Repayment,
+)
+from loans.utils import build_repayment_schedule
+from payments.models import Payment
+
+SEED_DOMAIN = "seed.greenloan.local"
+
+# (value, weight) pairs
+KYC_STATUSES = [("pending", 25), ("submitted", 15), ("verified", 55), ("rejected", 5)]
+APPLICATIONS_PER_CUSTOMER = [(0, 25), (1, 45), (2, 20), (3, 7), (4, 3)]
+APPLICATION_STATUSES = [
+    ("submitted", 8),
+    ("under_review", 6),
+    ("info_requested", 3),
+    ("info_provided", 2),
+    ("documents_verified", 3),
+    ("salary_verified", 2),
+    ("proposal_approved", 2),
+    ("final_review", 2),
+    ("approved", 50),
+    ("rejected", 22),
+]
+TENURES = [(12, 25), (24, 25), (36, 20), (60, 15), (120, 10), (240, 5)]
+# how customers repay: on-time, late and missed probabilities per instalment
+PAYERS = [((0.97, 0.02, 0.01), 70), ((0.80, 0.15, 0.05), 22), ((0.50, 0.25, 0.25), 8)]
+PAYMENT_METHODS = [("esewa", 45), ("bank", 25), ("qrpayment", 15), ("cash", 10), ("card", 5)]
+DEFAULT_DOCUMENTS = ["citizenship_front", "citizenship_back", "salary_slip"]
+
+# auto_now/auto_now_add fields, switched off so bulk_create keeps the generated dates
+TIMESTAMP_FIELDS = [
+    (Application, "created_at"),
+    (Application, "updated_at"),
+    (Document, "uploaded_at"),
+    (ApprovedLoans, "approved_at"),
+    (Payment, "paid_at"),
+    (KYCVerification, "created_at"),
+    (CreditScore, "last_updated"),
+]
+# child tables first, with their path to the owning user, for --clear
+SEEDED_MODELS = [
+    (Payment, "repayment__loan__application__applicant__in"),
+    (Repayment, "loan__application__applicant__in"),
+    (ApprovedLoans, "application__applicant__in"),
+    (ApplicationEvent, "application__applicant__in"),
+    (Document, "application__applicant__in"),
+    (Application, "applicant__in"),
+    (KYCVerification, "user__in"),
+    (CreditScore, "user__in"),
+]
+
+def pick(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+@contextmanager
+def explicit_timestamps():
+    fields = [model._meta.get_field(name) for model, name in TIMESTAMP_FIELDS]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic portfolio for load and scale testing: officers, customers, "
+        "KYC attempts, applications in every status with documents and timelines, approved "
+        "loans with their repayment schedules, and payments. The same --seed gives the same "
+        "data. Rows are bulk inserted, so no history rows, signals or mails are produced. "
+        "The daily portfolio rollup is rebuilt at the end. About 35000 customers give a "
+        "million repayments."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--customers", type=int, default=1000)
+        parser.add_argument("--officers", type=int, default=20)
+        parser.add_argument("--days", type=int, default=730, help="history span, ending today")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--block-size", type=int, default=1000, help="customers generated per transaction")
+        parser.add_argument("--batch-size", type=int, default=2000, help="rows per INSERT")
+        parser.add_argument("--password", default="greenloan", help="password of every seeded user")
+        parser.add_argument("--clear", action="store_true", help="delete previously seeded data first")
+
+    def handle(self, *args, **options):
+        if options["officers"] < 1:
+            raise CommandError("At least one officer is needed to approve the seeded loans.")
+        seeded_users = User.objects.filter(email__endswith=f"@{SEED_DOMAIN}")
+        if options["clear"]:
+            self.clear(seeded_users)
+        elif seeded_users.exists():
+            raise CommandError("Seeded data already exists, pass --clear to replace it.")
+
+        if not LoanTypes.objects.exists():
+            call_command("loaddata", "loan_types", verbosity=0)
+        self.loan_types = list(LoanTypes.objects.filter(is_active=True))
+
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.password = make_password(options["password"])
+        self.now = timezone.now()
+        self.today = timezone.localdate()
+        self.start = self.now - timedelta(days=options["days"])
+        self.counts = dict.fromkeys(["users", "kyc", "applications", "documents", "loans", "repayments", "payments"], 0)
+
+        started = time.perf_counter()
+        with explicit_timestamps():
+            with transaction.atomic():
+                self.officers = self.create_users(
+                    [self.officer(i) for i in range(options["officers"])]
+                )
+                self.senior_officers = [user for user in self.officers if user.role == "senior_officer"]
+
+            block = options["block_size"]
+            for first in range(0, options["customers"], block):
+                with transaction.atomic():
+                    self.seed_customers(range(first, min(first + block, options["customers"])))
+                self.stdout.write(
+                    f"{min(first + block, options['customers'])}/{options['customers']} customers, "
+                    f"{self.counts['repayments']} repayments, {time.perf_counter() - started:.0f}s"
+                )
+
+        call_command("backfill_portfolio_stats", stdout=self.stdout)
+        summary = ", ".join(f"{count} {name}" for name, count in self.counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Seeded {summary} in {time.perf_counter() - started:.0f}s."))
+
+    def clear(self, seeded_users):
+        # raw deletes: the cascade collector would load every row for the history signals
+        ids = seeded_users.values("pk")
+        with transaction.atomic():
+            for model, lookup in SEEDED_MODELS:
+                queryset = model.objects.filter(**{lookup: ids})
+                queryset._raw_delete(queryset.db)
+            seeded_users._raw_delete(seeded_users.db)
+
+    def timestamp(self, after, max_days=None):
+        """A random moment between `after` and now (or max_days after it)."""
+        end = self.now if max_days is None else min(self.now, after + timedelta(days=max_days))
+        return after + (end - after) * self.rng.random()
+
+    def create_users(self, users):
+        self.counts["users"] += len(users)
+        return User.objects.bulk_create(users, batch_size=self.batch_size)
+
+    def officer(self, i):
+        return User(
+            email=f"officer{i}@{SEED_DOMAIN}",
+            password=self.password,
+            first_name="Officer",
+            last_name=str(i),
+            full_name=f"Officer {i}",
+            role="senior_officer" if i % 4 == 0 else "loan_officer",
+            phone=f"98{i:08d}",
+            email_verified=True,
+            kyc_status="verified",
+            date_joined=self.start,
+        )
+
+    def seed_customers(self, numbers):
+        rng = self.rng
+        customers = self.create_users(
+            [
+                User(
+                    email=f"customer{i}@{SEED_DOMAIN}",
+                    password=self.password,
+                    first_name="Customer",
+                    last_name=str(i),
+                    full_name=f"Customer {i}",
+                    phone=f"97{i:08d}",
+                    email_verified=rng.random() < 0.9,
+                    kyc_status=pick(rng, KYC_STATUSES),
+                    monthly_income=rng.randrange(20, 400) * 1000,
+                    date_joined=self.timestamp(self.start),
+                )
+                for i in numbers
+            ]
+        )
+
+        attempts = []
+        for customer in customers:
+            if customer.kyc_status == "pending":
+                continue
+            for _ in range(rng.choice([1, 1, 1, 2, 3])):
+                created = self.timestamp(customer.date_joined, 30)
+                verified = customer.kyc_status == "verified" and rng.random() < 0.9
+                attempts.append(
+                    KYCVerification(
+                        user=customer,
+                        citizenship_image="kyc/citizenship/seed.jpg",
+                        selfie_image="kyc/selfie/seed.jpg",
+                        verified=verified,
+                        confidence=rng.uniform(0.7, 0.99) if verified else rng.uniform(0.1, 0.6),
+                        blink_detected=True,
+                        left_turn_detected=True,
+                        right_turn_detected=True,
+                        status="done" if rng.random() < 0.95 else "failed",
+                        attempts=1,
+                        started_at=created,
+                        finished_at=created + timedelta(seconds=rng.randint(2, 30)),
+                        created_at=created,
+                    )
+                )
+        KYCVerification.objects.bulk_create(attempts, batch_size=self.batch_size)
+        self.counts["kyc"] += len(attempts)
+
+        applications = []
+        for customer in customers:
+            for _ in range(pick(rng, APPLICATIONS_PER_CUSTOMER)):
+                loan_type = rng.choice(self.loan_types)
+                created = self.timestamp(customer.date_joined)
+                applications.append(
+                    Application(
+                        applicant=customer,
+                        loan_type=loan_type,
+                        amount=rng.randrange(10, 100) * loan_type.amount_limit / 100,
+                        duration_months=pick(rng, TENURES),
+                        purpose=f"{loan_type.name} for customer {customer.last_name}",
+                        monthly_income=customer.monthly_income,
+                        address="Kathmandu",
+                        citizenship_number=f"{customer.pk:010d}",
+                        status=pick(rng, APPLICATION_STATUSES),
+                        officer=rng.choice(self.officers) if self.officers else None,
+                        created_at=created,
+                        updated_at=created,
+                    )
+                )
+        applications = Application.objects.bulk_create(applications, batch_size=self.batch_size)
+        self.counts["applications"] += len(applications)
+
+        documents, events, loans = [], [], []
+        for application in applications:
+            decided = application.status in ("approved", "rejected")
+            for document_type in application.loan_type.required_documents or DEFAULT_DOCUMENTS:
+                documents.append(
+                    Document(
+                        application=application,
+                        document_type=document_type,
+                        file=f"documents/seed/{document_type}.pdf",
+                        verification_status="verified" if application.status == "approved" or (
+                            decided and rng.random() < 0.7
+                        ) else "pending",
+                        uploaded_at=application.created_at,
+                    )
+                )
+            events.append(ApplicationEvent(application=application, status="submitted", created_at=application.created_at))
+            if application.status != "submitted":
+                events.append(
+                    ApplicationEvent(
+                        application=application,
+                        status=application.status,
+                        actor=application.officer,
+                        created_at=self.timestamp(application.created_at, 14),
+                    )
+                )
+            if application.status == "approved":
+                loans.append(
+                    ApprovedLoans(
+                        application=application,
+                        principle=application.amount,
+                        interest_rate=application.loan_type.interest_rate,
+                        tenure_months=application.duration_months,
+                        approved_by=rng.choice(self.senior_officers or self.officers),
+                        approved_at=events[-1].created_at.date(),
+                        status="active",
+                    )
+                )
+        Document.objects.bulk_create(documents, batch_size=self.batch_size)
+        ApplicationEvent.objects.bulk_create(events, batch_size=self.batch_size)
+        self.counts["documents"] += len(documents)
+
+        repayments = []
+        for loan in loans:
+            repayments.extend(self.schedule(loan))
+        # statuses depend on the schedule, so loans are inserted after it is built
+        ApprovedLoans.objects.bulk_create(loans, batch_size=self.batch_size)
+        for repayment in repayments:
+            repayment.loan_id = repayment.loan.pk
+        repayments = Repayment.objects.bulk_create(repayments, batch_size=self.batch_size)
+        self.counts["loans"] += len(loans)
+        self.counts["repayments"] += len(repayments)
+
+        payments = [
+            Payment(
+                repayment=repayment,
+                amount=repayment.amount_paid,
+                method=pick(rng, PAYMENT_METHODS),
+                reference=f"SEED-{repayment.pk}",
+                paid_at=timezone.make_aware(datetime.combine(repayment.paid_date, clock(rng.randint(8, 19)))),
+            )
+            for repayment in repayments
+            if repayment.amount_paid
+        ]
+        Payment.objects.bulk_create(payments, batch_size=self.batch_size)
+        self.counts["payments"] += len(payments)
+
+        CreditScore.objects.bulk_create(
+            [
+                CreditScore(user=customer, score=rng.randint(450, 850), last_updated=self.now)
+                for customer in customers
+            ],
+            batch_size=self.batch_size,
+        )
+
+    def schedule(self, loan):
+        """The loan's instalments, paid according to a random payer profile; sets loan.status."""
+        rng = self.rng
+        on_time, late, _missed = pick(rng, PAYERS)
+        repayments = []
+        overdue = False
+        for row in build_repayment_schedule(loan.principle, loan.interest_rate, loan.tenure_months, loan.approved_at):
+            repayment = Repayment(loan=loan, due_date=row["due_date"], amount_due=row["amount_due"])
+            if row["due_date"] <= self.today:
+                roll = rng.random()
+                if roll < on_time:
+                    repayment.paid_date = row["due_date"] - timedelta(days=rng.randint(0, 5))
+                elif roll < on_time + late:
+                    repayment.paid_date = min(self.today, row["due_date"] + timedelta(days=rng.randint(1, 45)))
+                if repayment.paid_date:
+                    repayment.amount_paid = row["amount_due"]
+                elif rng.random() < 0.3:
+                    repayment.amount_paid = (row["amount_due"] * rng.randint(1, 9) / 10).quantize(row["amount_due"])
+                    repayment.paid_date = row["due_date"]
+                overdue = overdue or (
+                    repayment.amount_paid < row["amount_due"] and (self.today - row["due_date"]).days > 90
+                )
+            repayment.apply_status()
+            repayments.append(repayment)
+
+        if all(repayment.remaining_amount() <= 0 for repayment in repayments):
+            loan.status = "closed"
+        elif overdue:
+            loan.status = "defaulted"
+        return repayments
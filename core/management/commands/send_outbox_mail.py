@@ -0,0 +1,32 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from core.outbox import drain
+
+
+class Command(BaseCommand):
+    help = "Deliver queued EmailOutbox mail, one SMTP connection per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--poll-interval", type=float, default=5.0)
+        parser.add_argument("--once", action="store_true", help="Drain the queue and exit.")
+
+    def handle(self, *args, **options):
+        stop_event = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write("Stopping mail sender after the current batch...")
+            stop_event.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        drain(
+            stop_event,
+            batch_size=options["batch_size"],
+            poll_interval=options["poll_interval"],
+            once=options["once"],
+        )
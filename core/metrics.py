@@ -0,0 +1,376 @@
+"""
+In-process request metrics, served in the Prometheus text format at /metrics/.
+
+RequestMetricsMiddleware files every request under its resolved view name:
+wall time, database queries and query time, template rendering time and time
+spent dispatching signals (history rows, rollups, mail queueing, ...). The
+buckets overlap, a query run by a signal receiver counts in both.
+
+Every process counts in memory and, with settings.METRICS_DIR set (as
+gunicorn.conf.py does), writes its totals to a file there within a second
+of a change and at exit. A scrape is answered with the sum over all files, those of
+recycled workers included, so the counters only ever grow whichever worker
+serves /metrics/. gunicorn's child_exit hook folds the files of an exited
+worker into one file of retired totals, so they do not pile up.
+"""
+
+import atexit
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+from importlib import import_module
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.dispatch import Signal
+from django.template.backends.django import Template
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# name: (help, buckets)
+METRICS = {
+    "request_seconds": ("Wall time of the request.", SECONDS_BUCKETS),
+    "db_queries": ("Database queries run by the request.", QUERY_BUCKETS),
+    "db_seconds": ("Time spent in database queries.", SECONDS_BUCKETS),
+    "template_seconds": ("Time spent rendering templates.", SECONDS_BUCKETS),
+    "signal_seconds": ("Time spent in signal receivers.", SECONDS_BUCKETS),
+}
+PREFIX = "greenloan_"
+# seconds a change to a process's totals may wait before it is written to METRICS_DIR
+PUBLISH_INTERVAL = 1.0
+
+current_sample = ContextVar("current_sample", default=None)
+_installed = False
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class SharedTotals:
+    """
+    One JSON file of totals per process in settings.METRICS_DIR, named
+    <name>-<pid>-<random>.json so a reused pid never overwrites the file of an
+    exited worker. A daemon thread rewrites it within PUBLISH_INTERVAL of a
+    change, and once more at exit. retire() folds the files of exited
+    processes into <name>-retired.json. Without METRICS_DIR only this
+    process's totals are seen.
+    """
+
+    instances = []
+
+    def __init__(self, name, snapshot, merge):
+        self.name = name
+        self.snapshot = snapshot  # returns this process's totals, JSON-serializable
+        self.merge = merge  # sums a list of snapshots into one
+        self.lock = threading.Lock()
+        self.pid = None
+        self.filename = None
+        self.dirty = False
+        self.instances.append(self)
+        atexit.register(self.publish_at_exit)
+
+    def changed(self):
+        if not settings.METRICS_DIR:
+            return
+        self.dirty = True
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    # first change in this process, a forked worker starts a file of its own
+                    self.pid = os.getpid()
+                    self.filename = f"{self.name}-{self.pid}-{uuid.uuid4().hex[:8]}.json"
+                    writer = threading.Thread(target=self.publish_periodically, name=f"{self.name}-metrics")
+                    writer.daemon = True
+                    writer.start()
+
+    def publish_periodically(self):
+        while True:
+            time.sleep(PUBLISH_INTERVAL)
+            if self.dirty:
+                self.publish()
+
+    def publish_at_exit(self):
+        # only processes that counted something have a file
+        if self.pid == os.getpid():
+            self.publish()
+
+    def publish(self):
+        if not settings.METRICS_DIR or self.filename is None:
+            return
+        self.dirty = False
+        write_json(os.path.join(settings.METRICS_DIR, self.filename), self.snapshot())
+
+    def retire(self, pid):
+        """Fold the files of the exited process `pid` into the retired totals and remove them."""
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        files = {}
+        for path in glob.glob(os.path.join(directory, f"{self.name}-{pid}-*.json")):
+            snapshot = read_json(path)
+            if snapshot is not None:
+                files[os.path.basename(path)] = snapshot
+        if not files:
+            return
+
+        retired_path = os.path.join(directory, f"{self.name}-retired.json")
+        retired = read_json(retired_path) or {"folded": [], "totals": self.merge([])}
+        # the names tell collect() which files are already counted in here,
+        # until they are removed below
+        folded = [name for name in retired["folded"] if os.path.exists(os.path.join(directory, name))]
+        write_json(retired_path, {
+            "folded": folded + list(files),
+            "totals": self.merge([retired["totals"], *files.values()]),
+        })
+        for name in files:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+    def collect(self):
+        """The totals of every process, this one's current ones included."""
+        snapshots = [self.snapshot()]
+        if not settings.METRICS_DIR:
+            return snapshots
+        retired_name = f"{self.name}-retired.json"
+        skip = {retired_name, self.filename if self.pid == os.getpid() else None}
+        files = {}
+        for path in glob.glob(os.path.join(settings.METRICS_DIR, f"{self.name}-*.json")):
+            name = os.path.basename(path)
+            if name not in skip:
+                files[name] = read_json(path)
+        # read after the process files: retire() writes the retired totals
+        # before removing the files it folded into them
+        retired = read_json(os.path.join(settings.METRICS_DIR, retired_name))
+        if retired is not None:
+            snapshots.append(retired["totals"])
+            for name in retired["folded"]:
+                files.pop(name, None)
+        snapshots.extend(snapshot for snapshot in files.values() if snapshot is not None)
+        return snapshots
+
+
+def read_json(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None  # removed or being replaced
+
+
+def write_json(path, data):
+    """Replace `path` atomically, readers see the old or the new file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as file:
+        json.dump(data, file)
+    os.replace(tmp, path)
+
+
+def retire_process(pid):
+    """Fold the metric files of the exited process `pid` (gunicorn's child_exit hook)."""
+    import_module("core.slow_queries")  # its totals are shared too
+
+    for shared in SharedTotals.instances:
+        shared.retire(pid)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.shared = SharedTotals("requests", self.snapshot, self.merge)
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+            self.responses = {}
+
+    def record(self, view, status, values):
+        with self.lock:
+            histograms = self.views.get(view)
+            if histograms is None:
+                histograms = self.views[view] = {
+                    name: Histogram(buckets) for name, (_, buckets) in METRICS.items()
+                }
+            for name, value in values.items():
+                histograms[name].observe(value)
+            key = (view, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+        self.shared.changed()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "views": {view: {name: [list(h.counts), h.sum, h.count] for name, h in histograms.items()}
+                          for view, histograms in self.views.items()},
+                "responses": [[view, status, count] for (view, status), count in self.responses.items()],
+            }
+
+    def merge(self, snapshots):
+        """Sum the snapshots of several processes into one."""
+        views, responses = {}, {}
+        for snapshot in snapshots:
+            for view, status, count in snapshot["responses"]:
+                responses[(view, status)] = responses.get((view, status), 0) + count
+            for view, histograms in snapshot["views"].items():
+                merged = views.setdefault(view, {})
+                for name, (counts, total, count) in histograms.items():
+                    if name in merged:
+                        merged_counts, merged_total, merged_count = merged[name]
+                        counts = [a + b for a, b in zip(merged_counts, counts)]
+                        total += merged_total
+                        count += merged_count
+                    merged[name] = [list(counts), total, count]
+        return {
+            "views": views,
+            "responses": [[view, status, count] for (view, status), count in responses.items()],
+        }
+
+    def merged(self):
+        """Histograms and response counts summed over all processes."""
+        totals = self.merge(self.shared.collect())
+        return totals["views"], {(view, status): count for view, status, count in totals["responses"]}
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        views, responses = self.merged()
+
+        lines = [
+            f"# HELP {PREFIX}responses_total Responses by view and status code.",
+            f"# TYPE {PREFIX}responses_total counter",
+        ]
+        for (view, status), count in sorted(responses.items()):
+            lines.append(f'{PREFIX}responses_total{{view="{label(view)}",status="{status}"}} {count}')
+
+        for name, (help_text, buckets) in METRICS.items():
+            lines.append(f"# HELP {PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}{name} histogram")
+            for view in sorted(views):
+                counts, total, count = views[view][name]
+                view_label = f'view="{label(view)}"'
+                cumulative = 0
+                for bound, bucket_count in zip((*buckets, "+Inf"), counts):
+                    cumulative += bucket_count
+                    lines.append(f'{PREFIX}{name}_bucket{{{view_label},le="{bound}"}} {cumulative}')
+                lines.append(f"{PREFIX}{name}_sum{{{view_label}}} {total:.6f}")
+                lines.append(f"{PREFIX}{name}_count{{{view_label}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RequestSample:
+    __slots__ = ("db_queries", "db_seconds", "template_seconds", "signal_seconds", "running")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0
+        self.template_seconds = 0
+        self.signal_seconds = 0
+        self.running = set()
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - start
+            self.db_queries += 1
+
+
+def timed(field):
+    """Add the duration of calls made during a request to its sample's `field`, nested calls once."""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            sample = current_sample.get()
+            if sample is None or field in sample.running:
+                return func(*args, **kwargs)
+            sample.running.add(field)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                setattr(sample, field, getattr(sample, field) + time.perf_counter() - start)
+                sample.running.discard(field)
+
+        return wrapper
+
+    return decorator
+
+
+def install_timers():
+    """Time template rendering and signal dispatch; a no-op outside of measured requests."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    Template.render = timed("template_seconds")(Template.render)
+    Signal.send = timed("signal_seconds")(Signal.send)
+    Signal.send_robust = timed("signal_seconds")(Signal.send_robust)
+
+
+class RequestMetricsMiddleware:
+    """Records per-view request metrics into `registry` (settings.METRICS_ENABLED)."""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install_timers()
+
+    def __call__(self, request):
+        sample = RequestSample()
+        token = current_sample.set(sample)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(sample.db_wrapper))
+                response = self.get_response(request)
+        finally:
+            current_sample.reset(token)
+
+        match = request.resolver_match
+        registry.record(
+            match.view_name if match else "unresolved",
+            response.status_code,
+            {
+                "request_seconds": time.perf_counter() - start,
+                "db_queries": sample.db_queries,
+                "db_seconds": sample.db_seconds,
+                "template_seconds": sample.template_seconds,
+                "signal_seconds": sample.signal_seconds,
+            },
+        )
+        return response
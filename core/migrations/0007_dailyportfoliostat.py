@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_historicalsitepage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPortfolioStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('applications_total', models.IntegerField(default=0)),
+                ('applications_submitted', models.IntegerField(default=0)),
+                ('applications_under_review', models.IntegerField(default=0)),
+                ('applications_info_requested', models.IntegerField(default=0)),
+                ('applications_info_provided', models.IntegerField(default=0)),
+                ('applications_documents_verified', models.IntegerField(default=0)),
+                ('applications_salary_verified', models.IntegerField(default=0)),
+                ('applications_proposal_approved', models.IntegerField(default=0)),
+                ('applications_final_review', models.IntegerField(default=0)),
+                ('applications_approved', models.IntegerField(default=0)),
+                ('applications_rejected', models.IntegerField(default=0)),
+                ('loans_approved', models.IntegerField(default=0)),
+                ('loans_active', models.IntegerField(default=0)),
+                ('loans_closed', models.IntegerField(default=0)),
+                ('loans_defaulted', models.IntegerField(default=0)),
+                ('revenue_collected', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('staff_users', models.IntegerField(default=0)),
+                ('kyc_pending', models.IntegerField(default=0)),
+                ('kyc_submitted', models.IntegerField(default=0)),
+                ('kyc_verified', models.IntegerField(default=0)),
+                ('kyc_rejected', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
-from simple_history.models import HistoricalRecords
+from django.utils import timezone
+from core.history import HistoricalRecords
 
 
 class SitePage(models.Model):
@@ -14,4 +15,89 @@ class SitePage(models.Model):
         return self.allowed_income_percent
 
 
-    history = HistoricalRecords()
\ No newline at end of file
+    history = HistoricalRecords()
+
+class DailyPortfolioStat(models.Model):
+    """
+    Pre-aggregated dashboard counters, one row per day.
+
+    Each row counts the objects created that day grouped by their current
+    state (an application submitted on the 3rd and approved on the 9th moves
+    from the 3rd's submitted column to the 3rd's approved column), plus the
+    money collected that day. Kept current by core.signals and rebuilt with
+    `manage.py backfill_portfolio_stats`.
+    """
+
+    date = models.DateField(unique=True)
+
+    # applications by created date and current status
+    applications_total = models.IntegerField(default=0)
+    applications_submitted = models.IntegerField(default=0)
+    applications_under_review = models.IntegerField(default=0)
+    applications_info_requested = models.IntegerField(default=0)
+    applications_info_provided = models.IntegerField(default=0)
+    applications_documents_verified = models.IntegerField(default=0)
+    applications_salary_verified = models.IntegerField(default=0)
+    applications_proposal_approved = models.IntegerField(default=0)
+    applications_final_review = models.IntegerField(default=0)
+    applications_approved = models.IntegerField(default=0)
+    applications_rejected = models.IntegerField(default=0)
+
+    # approved loans by approval date and current status
+    loans_approved = models.IntegerField(default=0)
+    loans_active = models.IntegerField(default=0)
+    loans_closed = models.IntegerField(default=0)
+    loans_defaulted = models.IntegerField(default=0)
+
+    # payments by paid date
+    revenue_collected = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    # users by joined date and current role / kyc status
+    staff_users = models.IntegerField(default=0)
+    kyc_pending = models.IntegerField(default=0)
+    kyc_submitted = models.IntegerField(default=0)
+    kyc_verified = models.IntegerField(default=0)
+    kyc_rejected = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["date"]
+
+    def __str__(self):
+        return f"Portfolio {self.date}"
+
+
+class EmailOutbox(models.Model):
+    """
+    Outgoing email, written in the same transaction as the change that
+    triggers it and delivered by `manage.py send_outbox_mail` (core/outbox.py).
+    """
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("sending", "Sending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField(default=list)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="email_outbox_queue_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)}"
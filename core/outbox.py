@@ -0,0 +1,138 @@
+"""
+Transactional email outbox.
+
+Views and signal receivers call queue_mail() instead of send_mail(). It only
+inserts an EmailOutbox row inside whatever transaction is open, so no request
+waits on an SMTP round-trip and a rolled back signup never sends its welcome
+mail. `manage.py send_outbox_mail` drains the table, delivering each batch over
+a single SMTP connection and retrying failures with exponential backoff.
+"""
+
+import contextlib
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+RETRY_BASE = 30  # seconds, doubled after every failed attempt
+STALE_AFTER = timedelta(minutes=10)
+
+
+def queue_mail(subject, message, recipient_list, from_email=None, html_message=None):
+    """Same arguments as django.core.mail.send_mail, delivered later by the outbox sender."""
+    return EmailOutbox.objects.create(
+        subject=subject,
+        body=message,
+        html_body=html_message or "",
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=RETRY_BASE * 2 ** (attempts - 1))
+
+
+def requeue_stale_mail(stale_after=STALE_AFTER):
+    """Put back mail claimed by a sender that died before recording the result."""
+    return EmailOutbox.objects.filter(
+        status="sending",
+        claimed_at__lt=timezone.now() - stale_after,
+    ).update(status="pending")
+
+
+def claim_batch(batch_size):
+    """
+    Claim up to batch_size due mails.
+
+    Same conditional UPDATE as the KYC worker, so several senders can run
+    without delivering a mail twice.
+    """
+    now = timezone.now()
+    ids = list(
+        EmailOutbox.objects.filter(status="pending", next_attempt_at__lte=now)
+        .order_by("next_attempt_at", "id")
+        .values_list("id", flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    EmailOutbox.objects.filter(pk__in=ids, status="pending").update(status="sending", claimed_at=now)
+    return list(EmailOutbox.objects.filter(pk__in=ids, status="sending", claimed_at=now).order_by("id"))
+
+
+def build_message(mail, connection):
+    message = EmailMultiAlternatives(
+        mail.subject, mail.body, mail.from_email, mail.recipients, connection=connection
+    )
+    if mail.html_body:
+        message.attach_alternative(mail.html_body, "text/html")
+    return message
+
+
+def send_batch(batch_size=100, connection=None):
+    """Deliver one batch over a single connection, return (sent, failed) counts."""
+    batch = claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+
+    connection = connection or get_connection()
+    sent, failed = [], []
+    try:
+        for mail in batch:
+            try:
+                # no-op while the connection is up, reconnects after a failure
+                connection.open()
+                build_message(mail, connection).send()
+            except Exception as e:
+                logger.warning("Outbox mail %s failed: %s", mail.id, e)
+                failed.append((mail, e))
+                with contextlib.suppress(Exception):
+                    connection.close()
+            else:
+                sent.append(mail.id)
+    finally:
+        with contextlib.suppress(Exception):
+            connection.close()
+
+    now = timezone.now()
+    EmailOutbox.objects.filter(pk__in=sent).update(
+        status="sent", sent_at=now, attempts=F("attempts") + 1, last_error=""
+    )
+    for mail, error in failed:
+        mail.attempts += 1
+        mail.last_error = str(error) or error.__class__.__name__
+        if mail.attempts >= MAX_ATTEMPTS:
+            mail.status = "failed"
+        else:
+            mail.status = "pending"
+            mail.next_attempt_at = now + retry_delay(mail.attempts)
+        mail.save(update_fields=["attempts", "last_error", "status", "next_attempt_at"])
+    return len(sent), len(failed)
+
+
+def drain(stop_event=None, batch_size=100, poll_interval=5.0, once=False):
+    """Sender loop: deliver batches until told to stop, or until the queue is empty with once."""
+    next_requeue = 0
+    while stop_event is None or not stop_event.is_set():
+        close_old_connections()
+        if time.monotonic() >= next_requeue:
+            requeue_stale_mail()
+            next_requeue = time.monotonic() + 60
+
+        sent, failed = send_batch(batch_size)
+        if sent or failed:
+            logger.info("Outbox batch: %s sent, %s failed", sent, failed)
+            continue
+        if once:
+            return
+        time.sleep(poll_interval)
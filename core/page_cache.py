@@ -0,0 +1,57 @@
+"""
+Rendered-page caching for the public pages.
+
+Anonymous visitors without a session share one cached copy of a page, anyone
+with a session or flash-message cookie (logged in, mid-signup, ...) gets it
+rendered, with the user-independent sections still served from template
+fragment caches. Both are keyed on a generation stamp that config changes
+bump (core.signals), so an edited loan type shows up on the next request.
+The stamp lives in the default cache, which every worker has to share for a
+bump to reach them all (gunicorn.conf.py sets a shared CACHE_URL).
+"""
+
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+
+GENERATION_KEY = "page_cache:generation"
+
+
+def cache_generation():
+    return cache.get_or_set(GENERATION_KEY, time.time_ns, None)
+
+
+def bump_generation():
+    cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+def has_session(request):
+    return settings.SESSION_COOKIE_NAME in request.COOKIES or CookieStorage.cookie_name in request.COOKIES
+
+
+def cache_anonymous_page(view):
+    """Serve GET requests without a session from a shared full-page cache (settings.PAGE_CACHE_TIMEOUT)."""
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        timeout = settings.PAGE_CACHE_TIMEOUT
+        if not timeout or request.method not in ("GET", "HEAD") or has_session(request):
+            return view(request, *args, **kwargs)
+
+        key = f"page:{cache_generation()}:{request.get_full_path()}"
+        response = cache.get(key)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, "render"):
+                response.render()
+            # the copy is only valid for requests without a session cookie
+            patch_vary_headers(response, ("Cookie",))
+            if response.status_code == 200 and not response.cookies:
+                cache.set(key, response, timeout)
+        return response
+
+    return wrapped
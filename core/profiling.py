@@ -0,0 +1,173 @@
+"""
+Opt-in request profiling for admins.
+
+An admin adds `?_profile=1` (or the `X-Profile: 1` header) to any URL and a
+stack sampler records the request's own thread, in the folded-stack format
+flamegraph.pl and speedscope read. `cprofile` instead of `1` runs it under
+cProfile for exact call counts, with two caveats under gunicorn's threaded
+workers: cProfile (sys.monitoring on Python 3.12+) sees every thread of the
+process, so the pstats file includes whatever other requests ran meanwhile,
+and only one request per process can be profiled at a time, a concurrent one
+is served without a profile (X-Profile: busy). Profiles go to
+settings.PROFILE_DIR, which keeps the newest settings.PROFILE_KEEP files, and
+are listed at /settings/profiles/.
+
+Other requests only pay for a header lookup and a substring check.
+"""
+
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+
+PROFILE_PARAM = "_profile"
+PROFILE_HEADER = "HTTP_X_PROFILE"
+MODES = {"1": "folded", "sample": "folded", "cprofile": "pstats"}
+# cProfile is process-wide, one profiled request at a time
+_cprofile_lock = threading.Lock()
+FILENAME_RE = re.compile(r"^(?P<stamp>\d{8}-\d{6}-\d{6})_(?P<view>[\w.-]+)_(?P<ms>\d+)ms\.(?P<format>pstats|folded)$")
+
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval` seconds from a helper thread."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, "w") as output:
+            for stack, count in self.stacks.most_common():
+                output.write(f"{stack} {count}\n")
+
+
+def profile_mode(request):
+    value = request.GET.get(PROFILE_PARAM) or request.META.get(PROFILE_HEADER)
+    return MODES.get(value)
+
+
+def save_path(request, elapsed, extension):
+    match = request.resolver_match
+    view = re.sub(r"[^\w.-]", "-", match.view_name if match else "unresolved")
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    return os.path.join(settings.PROFILE_DIR, f"{stamp}_{view}_{int(elapsed * 1000)}ms.{extension}")
+
+
+def list_profiles():
+    """Saved profiles, newest first, as dicts of name, view, duration, format, size and date."""
+    try:
+        names = os.listdir(settings.PROFILE_DIR)
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in sorted(names, reverse=True):
+        match = FILENAME_RE.match(name)
+        if not match:
+            continue
+        try:
+            size = os.path.getsize(os.path.join(settings.PROFILE_DIR, name))
+        except FileNotFoundError:  # pruned by another worker meanwhile
+            continue
+        profiles.append({
+            "name": name,
+            "view": match["view"],
+            "ms": int(match["ms"]),
+            "format": match["format"],
+            "size": size,
+            "created": datetime.strptime(match["stamp"], "%Y%m%d-%H%M%S-%f"),
+        })
+    return profiles
+
+
+def profile_path(name):
+    """Path of a saved profile, None unless `name` is in the listing (never a user-supplied path)."""
+    if name in {profile["name"] for profile in list_profiles()}:
+        return os.path.join(settings.PROFILE_DIR, name)
+    return None
+
+
+def prune_profiles():
+    for profile in list_profiles()[settings.PROFILE_KEEP:]:
+        try:
+            os.remove(os.path.join(settings.PROFILE_DIR, profile["name"]))
+        except FileNotFoundError:
+            pass
+
+
+class ProfilerMiddleware:
+    """Runs admin requests that ask for it under a profiler; goes after AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if PROFILE_HEADER not in request.META and PROFILE_PARAM not in request.META.get("QUERY_STRING", ""):
+            return self.get_response(request)
+        mode = profile_mode(request)
+        if mode is None or getattr(request.user, "role", None) != "admin":
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        if mode == "pstats":
+            if not _cprofile_lock.acquire(blocking=False):
+                return self.unprofiled(request, "busy")
+            try:
+                profiler = cProfile.Profile()
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # another profiler or debugger (coverage, ...) holds the hook
+                    profiler = None
+                else:
+                    try:
+                        response = self.get_response(request)
+                    finally:
+                        profiler.disable()
+            finally:
+                _cprofile_lock.release()
+            if profiler is None:
+                return self.unprofiled(request, "unavailable")
+            path = save_path(request, time.perf_counter() - start, "pstats")
+            profiler.dump_stats(path)
+        else:
+            with StackSampler(settings.PROFILE_SAMPLE_INTERVAL) as sampler:
+                response = self.get_response(request)
+            path = save_path(request, time.perf_counter() - start, "folded")
+            sampler.write(path)
+        prune_profiles()
+
+        response["X-Profile"] = os.path.basename(path)
+        return response
+
+    def unprofiled(self, request, reason):
+        response = self.get_response(request)
+        response["X-Profile"] = reason
+        return response
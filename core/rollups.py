@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from core.models import DailyPortfolioStat
+
+STAT_FIELDS = [
+    f.name for f in DailyPortfolioStat._meta.fields if f.name not in ("id", "date")
+]
+
+
+def local_day(value):
+    """Dashboards bucket datetimes on their local date."""
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.date()
+    return value
+
+
+def column(prefix, value):
+    """Counter column for a status value, None when the status is not tracked."""
+    name = f"{prefix}_{value}"
+    return name if name in STAT_FIELDS else None
+
+
+def shift(deltas, prefix, old=None, new=None, count=1):
+    """Move `count` objects from the `old` status column to the `new` one."""
+    old_col = column(prefix, old) if old is not None else None
+    new_col = column(prefix, new) if new is not None else None
+    if old_col:
+        deltas[old_col] = deltas.get(old_col, 0) - count
+    if new_col:
+        deltas[new_col] = deltas.get(new_col, 0) + count
+    return deltas
+
+
+def bump(day, **deltas):
+    """Apply counter deltas to a day's row with a single UPDATE, creating it if needed."""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas or day is None:
+        return
+
+    updates = {k: F(k) + v for k, v in deltas.items()}
+    if DailyPortfolioStat.objects.filter(date=day).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            DailyPortfolioStat.objects.create(date=day, **deltas)
+    except IntegrityError:
+        # another request created the row in between
+        DailyPortfolioStat.objects.filter(date=day).update(**updates)
+
+
+def portfolio_totals(start=None, end=None):
+    """Sum every counter over a date range (all time when no range is given)."""
+    qs = DailyPortfolioStat.objects.all()
+    if start is not None:
+        qs = qs.filter(date__gte=start)
+    if end is not None:
+        qs = qs.filter(date__lte=end)
+    totals = qs.aggregate(**{name: Sum(name) for name in STAT_FIELDS})
+    return {name: value or 0 for name, value in totals.items()}
@@ -0,0 +1,148 @@
+"""Keep DailyPortfolioStat and the configuration cache current from the write paths."""
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from core.config_cache import invalidate
+from core.models import SitePage
+from core.page_cache import bump_generation
+from core.rollups import bump, local_day, shift
+from loans.models import Application, ApprovedLoans, LoanTypes
+from payments.models import Payment
+
+User = get_user_model()
+
+TRACKED_FIELDS = {
+    Application: ("status",),
+    ApprovedLoans: ("status",),
+    User: ("role", "kyc_status"),
+}
+
+
+def remember_state(sender, instance, **kwargs):
+    # only fields already loaded, reading a deferred field would cost a query
+    instance._rollup_state = {
+        name: instance.__dict__.get(name) for name in TRACKED_FIELDS[sender]
+    }
+
+
+for model in TRACKED_FIELDS:
+    post_init.connect(remember_state, sender=model, dispatch_uid=f"rollup_state_{model.__name__}")
+
+
+def changed(instance, name, created, update_fields):
+    """Return the previous value of a tracked field, or None when it did not change."""
+    if created or (update_fields is not None and name not in update_fields):
+        return None
+    old = getattr(instance, "_rollup_state", {}).get(name)
+    new = getattr(instance, name)
+    return old if old is not None and old != new else None
+
+
+def is_staff_role(role):
+    return role is not None and role != "customer"
+
+
+@receiver(post_save, sender=Application)
+def application_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = {}
+    if created:
+        deltas["applications_total"] = 1
+        shift(deltas, "applications", new=instance.status)
+    else:
+        old = changed(instance, "status", created, update_fields)
+        if old is not None:
+            shift(deltas, "applications", old, instance.status)
+    bump(local_day(instance.created_at), **deltas)
+    remember_state(sender, instance)
+
+
+@receiver(post_delete, sender=Application)
+def application_deleted(sender, instance, **kwargs):
+    deltas = shift({"applications_total": -1}, "applications", old=instance.status)
+    bump(local_day(instance.created_at), **deltas)
+
+
+@receiver(post_save, sender=ApprovedLoans)
+def loan_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = {}
+    if created:
+        deltas["loans_approved"] = 1
+        shift(deltas, "loans", new=instance.status)
+    else:
+        old = changed(instance, "status", created, update_fields)
+        if old is not None:
+            shift(deltas, "loans", old, instance.status)
+    bump(instance.approved_at, **deltas)
+    remember_state(sender, instance)
+
+
+@receiver(post_delete, sender=ApprovedLoans)
+def loan_deleted(sender, instance, **kwargs):
+    deltas = shift({"loans_approved": -1}, "loans", old=instance.status)
+    bump(instance.approved_at, **deltas)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = {}
+    if created:
+        deltas["staff_users"] = int(is_staff_role(instance.role))
+        shift(deltas, "kyc", new=instance.kyc_status)
+    else:
+        old_role = changed(instance, "role", created, update_fields)
+        if old_role is not None:
+            deltas["staff_users"] = int(is_staff_role(instance.role)) - int(is_staff_role(old_role))
+        old_kyc = changed(instance, "kyc_status", created, update_fields)
+        if old_kyc is not None:
+            shift(deltas, "kyc", old_kyc, instance.kyc_status)
+    bump(local_day(instance.date_joined), **deltas)
+    remember_state(sender, instance)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    deltas = shift({"staff_users": -int(is_staff_role(instance.role))}, "kyc", old=instance.kyc_status)
+    bump(local_day(instance.date_joined), **deltas)
+
+
+@receiver(post_save, sender=Payment)
+def payment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump(local_day(instance.paid_at), revenue_collected=instance.amount)
+
+
+@receiver(post_delete, sender=Payment)
+def payment_deleted(sender, instance, **kwargs):
+    bump(local_day(instance.paid_at), revenue_collected=-instance.amount)
+
+
+CONFIG_CACHE_KEYS = {
+    SitePage: "site_page",
+    LoanTypes: "loan_types",
+}
+
+
+@receiver(post_save, sender=SitePage)
+@receiver(post_delete, sender=SitePage)
+@receiver(post_save, sender=LoanTypes)
+@receiver(post_delete, sender=LoanTypes)
+def config_changed(sender, **kwargs):
+    key = CONFIG_CACHE_KEYS[sender]
+
+    def drop():
+        invalidate(key)
+        # cached pages and fragments render these rows
+        bump_generation()
+
+    drop()
+    # again once committed, a read in between may have cached the old row
+    transaction.on_commit(drop)
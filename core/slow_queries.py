@@ -0,0 +1,201 @@
+"""
+Slow-query log.
+
+SlowQueryMiddleware watches every query a request runs. Queries slower than
+settings.SLOW_QUERY_MS are logged with the view name, the user's role and a
+fingerprint of the statement, with literals and IN lists folded, so repeats
+of the same query group together. The per-fingerprint totals are ranked on the
+Settings > Slow queries page and exported on /metrics/.
+
+With settings.SLOW_QUERY_EXPLAIN on PostgreSQL, the plan of the first slow
+run of each SELECT fingerprint is captured too, with EXPLAIN (ANALYZE off).
+
+Like the request metrics, each process's totals are shared through
+settings.METRICS_DIR, so the page and /metrics/ show all workers together.
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections, transaction
+
+from core.metrics import SharedTotals, label
+
+logger = logging.getLogger(__name__)
+
+# fingerprints tracked per process, later newcomers are only logged
+MAX_FINGERPRINTS = 500
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(sql):
+    """The statement with literals and placeholders as ?, IN lists as (...), whitespace collapsed."""
+    sql = STRING_RE.sub("?", sql)
+    sql = NUMBER_RE.sub("?", sql).replace("%s", "?")
+    sql = IN_LIST_RE.sub("(...)", sql)
+    return SPACE_RE.sub(" ", sql).strip()
+
+
+def fingerprint(statement):
+    return hashlib.sha1(statement.encode()).hexdigest()[:12]
+
+
+class SlowQueryStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.shared = SharedTotals("slow_queries", self.snapshot, self.merge)
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.queries = {}
+
+    def record(self, statement, seconds, view):
+        """Count a slow run; returns the fingerprint's entry (None once full) and whether it is new."""
+        key = fingerprint(statement)
+        with self.lock:
+            entry = self.queries.get(key)
+            new = entry is None
+            if new:
+                if len(self.queries) >= MAX_FINGERPRINTS:
+                    return None, False
+                entry = self.queries[key] = {
+                    "fingerprint": key,
+                    "statement": statement,
+                    "count": 0,
+                    "total": 0,
+                    "max": 0,
+                    "views": Counter(),
+                    "explain": None,
+                }
+            entry["count"] += 1
+            entry["total"] += seconds
+            entry["max"] = max(entry["max"], seconds)
+            entry["views"][view] += 1
+        self.shared.changed()
+        return entry, new
+
+    def snapshot(self):
+        with self.lock:
+            return {key: {**entry, "views": dict(entry["views"])} for key, entry in self.queries.items()}
+
+    def merge(self, snapshots):
+        """Sum the snapshots of several processes into one."""
+        merged = {}
+        for snapshot in snapshots:
+            for key, entry in snapshot.items():
+                if key not in merged:
+                    merged[key] = {**entry, "views": Counter(entry["views"])}
+                    continue
+                total = merged[key]
+                total["count"] += entry["count"]
+                total["total"] += entry["total"]
+                total["max"] = max(total["max"], entry["max"])
+                total["views"].update(entry["views"])
+                total["explain"] = total["explain"] or entry["explain"]
+        return {key: {**entry, "views": dict(entry["views"])} for key, entry in merged.items()}
+
+    def ranked(self):
+        """Entries of all processes by total time, worst first."""
+        merged = self.merge(self.shared.collect())
+        entries = [{**entry, "views": Counter(entry["views"]).most_common()} for entry in merged.values()]
+        return sorted(entries, key=lambda entry: entry["total"], reverse=True)
+
+    def render(self):
+        """Prometheus counters per fingerprint and view."""
+        lines = [
+            "# HELP greenloan_slow_queries_total Queries over SLOW_QUERY_MS by fingerprint and view.",
+            "# TYPE greenloan_slow_queries_total counter",
+        ]
+        for entry in self.ranked():
+            for view, count in entry["views"]:
+                lines.append(f'greenloan_slow_queries_total{{fingerprint="{entry["fingerprint"]}",view="{label(view)}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+stats = SlowQueryStats()
+
+
+def explain(connection, sql, params):
+    try:
+        # a savepoint, so a failure cannot break the request's transaction
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE off) {sql}", params)
+            return "\n".join(row[0] for row in cursor.fetchall())
+    except DatabaseError as exc:
+        return f"EXPLAIN failed: {exc}"
+
+
+class QueryWatcher:
+    """Execute wrapper reporting the request's queries over the threshold."""
+
+    def __init__(self, request, threshold):
+        self.request = request
+        self.threshold = threshold
+        self.reporting = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        elapsed = time.perf_counter() - start
+        # queries run while reporting (the user lookup, EXPLAIN) are not watched
+        if elapsed >= self.threshold and not self.reporting:
+            self.reporting = True
+            try:
+                self.report(sql, params, many, elapsed, context["connection"])
+            finally:
+                self.reporting = False
+        return result
+
+    def report(self, sql, params, many, elapsed, connection):
+        match = self.request.resolver_match
+        view = match.view_name if match else "unresolved"
+        role = getattr(getattr(self.request, "user", None), "role", None) or "anonymous"
+        statement = normalize(sql)
+        entry, new = stats.record(statement, elapsed, view)
+
+        if (
+            new
+            and settings.SLOW_QUERY_EXPLAIN
+            and connection.vendor == "postgresql"
+            and not many
+            and statement.upper().startswith(("SELECT", "WITH"))
+        ):
+            entry["explain"] = explain(connection, sql, params)
+            stats.shared.changed()
+
+        logger.warning(
+            "Slow query %.0f ms view=%s role=%s fingerprint=%s: %s",
+            elapsed * 1000,
+            view,
+            role,
+            fingerprint(statement),
+            statement,
+        )
+
+
+class SlowQueryMiddleware:
+    """Logs the queries of a request slower than settings.SLOW_QUERY_MS (0 turns it off)."""
+
+    def __init__(self, get_response):
+        if settings.SLOW_QUERY_MS <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        watcher = QueryWatcher(request, settings.SLOW_QUERY_MS / 1000)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(watcher))
+            return self.get_response(request)
@@ -0,0 +1,41 @@
+"""
+Test helpers shared by the apps' tests.
+
+QueryBudgetMixin catches N+1 queries: it requests a page, seeds more of the
+rows the page lists, requests it again and fails if the second request ran
+more queries than the first.
+"""
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    # rows seeded before the first and the second request
+    budget_sizes = (1, 5)
+
+    def count_queries(self, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries)
+
+    def assertQueryCountConstant(self, url, seed, data=None, max_queries=None):
+        """
+        seed(n) adds n rows that show up on the page at url. The page must run
+        the same number of queries for both budget_sizes (and no more than
+        max_queries, if given).
+        """
+        small, large = self.budget_sizes
+        seed(small)
+        small_count = self.count_queries(url, data)
+        seed(large - small)
+        large_count = self.count_queries(url, data)
+
+        self.assertEqual(
+            small_count,
+            large_count,
+            f"{url}: {small_count} queries with {small} rows, {large_count} with {large}",
+        )
+        if max_queries is not None:
+            self.assertLessEqual(large_count, max_queries, url)
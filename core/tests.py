@@ -1,3 +1,599 @@
-from django.test import TestCase
+import json
+import os
+import pstats
+import smtplib
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import update_last_login
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import transaction
+from django.db.models import F, Q
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from core import config_cache, metrics, profiling, slow_queries
+from core.audit import attach_changes, audit_history, iter_audit_rows, with_previous_version
+from core.models import EmailOutbox, SitePage
+from loans.forms import ApplicationForm
+from loans.models import Application, ApprovedLoans, LoanTypes, Repayment
+from core.outbox import MAX_ATTEMPTS, queue_mail, send_batch
+from core.testing import QueryBudgetMixin
+
+
+class FlakyBackend(EmailBackend):
+    """locmem backend that refuses mail for @bounce.test."""
+
+    def send_messages(self, messages):
+        for message in messages:
+            if any(to.endswith("@bounce.test") for to in message.to):
+                raise smtplib.SMTPRecipientsRefused({message.to[0]: (550, b"no such user")})
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        # the default admin's welcome mail, queued by post_migrate
+        EmailOutbox.objects.all().delete()
+
+    def test_signup_queues_instead_of_sending(self):
+        User.objects.create_user(email="new@example.com", full_name="New User")
+
+        self.assertEqual(len(mail.outbox), 0)
+        queued = EmailOutbox.objects.get(recipients=["new@example.com"])
+        self.assertEqual(queued.status, "pending")
+
+    def test_rolled_back_transaction_drops_the_mail(self):
+        with transaction.atomic():
+            queue_mail("Hello", "body", ["a@example.com"])
+            transaction.set_rollback(True)
+
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    def test_send_batch_delivers_and_marks_sent(self):
+        for i in range(3):
+            queue_mail("Hello", "body", [f"user{i}@example.com"], html_message="<p>body</p>")
+
+        self.assertEqual(send_batch(), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].alternatives, [("<p>body</p>", "text/html")])
+        self.assertFalse(EmailOutbox.objects.exclude(status="sent").exists())
+        self.assertEqual(send_batch(), (0, 0))
+
+    def test_failed_mail_is_retried_with_backoff(self):
+        queue_mail("Hello", "body", ["ok@example.com"])
+        bounced = queue_mail("Hello", "body", ["gone@bounce.test"])
+
+        with self.assertLogs("core.outbox", "WARNING") as logs:
+            self.assertEqual(send_batch(connection=FlakyBackend()), (1, 1))
+        self.assertIn(f"Outbox mail {bounced.id} failed", logs.output[0])
+
+        bounced.refresh_from_db()
+        self.assertEqual(bounced.status, "pending")
+        self.assertEqual(bounced.attempts, 1)
+        self.assertIn("no such user", bounced.last_error)
+        self.assertGreater(bounced.next_attempt_at, timezone.now())
+        # not due yet
+        self.assertEqual(send_batch(connection=FlakyBackend()), (0, 0))
+
+        EmailOutbox.objects.filter(pk=bounced.pk).update(attempts=MAX_ATTEMPTS - 1, next_attempt_at=timezone.now())
+        with self.assertLogs("core.outbox", "WARNING"):
+            self.assertEqual(send_batch(connection=FlakyBackend()), (0, 1))
+        bounced.refresh_from_db()
+        self.assertEqual(bounced.status, "failed")
+
+
+class HistoryWriteTests(TestCase):
+    def test_saves_of_excluded_fields_write_no_history(self):
+        user = User.objects.create_user(email="login@example.com", password="pass")
+        versions = user.history.count()
+
+        update_last_login(None, user)
+        self.assertEqual(user.history.count(), versions)
+
+        user.full_name = "Renamed"
+        user.save()
+        self.assertEqual(user.history.count(), versions + 1)
+        self.assertFalse(hasattr(user.history.model, "password"))
+
+    def test_compaction_keeps_the_last_version_per_period(self):
+        user = User.objects.create_user(email="old@example.com")
+        for i in range(3):
+            user.full_name = f"Name {i}"
+            user.save()
+        history = user.history.model.objects.filter(id=user.id)
+        old = datetime(2024, 1, 5, tzinfo=dt_timezone.utc)
+        for offset, record in enumerate(history.order_by("history_id")):
+            # everything in the same month except the last version
+            history.filter(pk=record.pk).update(
+                history_date=old + timedelta(days=40 if record == history.latest("history_id") else offset)
+            )
+
+        out = StringIO()
+        call_command("compact_history", "--models", "accounts.User", stdout=out)
+
+        self.assertIn("Deleted 2 rows", out.getvalue())
+        self.assertEqual(
+            list(history.order_by("history_date").values_list("full_name", flat=True)),
+            ["Name 1", "Name 2"],
+        )
+
+
+    @override_settings(AUDIT_STORE_DIFFS=True)
+    def test_compaction_restates_the_diffs_of_the_survivors(self):
+        user = User.objects.create_user(email="diffs@example.com", full_name="Name 0")
+        for i in range(1, 4):
+            user.full_name = f"Name {i}"
+            user.save()
+        history = user.history.model.objects.filter(id=user.id)
+        # Name 1 and Name 2 share February, so Name 1 goes
+        dates = [datetime(2024, month, day, tzinfo=dt_timezone.utc) for month, day in ((1, 5), (2, 5), (2, 6), (3, 10))]
+        for record, date in zip(history.order_by("history_id"), dates):
+            history.filter(pk=record.pk).update(history_date=date)
+
+        call_command("compact_history", "--models", "accounts.User", stdout=StringIO())
+
+        stored = list(history.order_by("history_id").values_list("full_name", "changes"))
+        self.assertEqual(stored, [
+            ("Name 0", []),
+            ("Name 2", [{"field": "full_name", "old": "Name 0", "new": "Name 2"}]),
+            ("Name 3", [{"field": "full_name", "old": "Name 2", "new": "Name 3"}]),
+        ])
+        with self.settings(AUDIT_STORE_DIFFS=False):
+            history.update(changes=None)
+            rows = attach_changes(list(with_previous_version(history.order_by("history_id"))))
+        self.assertEqual([row.audit_changes for row in rows], [changes for _, changes in stored])
+
+
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class AuditLogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email="audit@example.com", password="pass", role="admin")
+        cls.subject = User.objects.create_user(email="subject@example.com", full_name="Name 0")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def rename(self, times):
+        for i in range(1, times + 1):
+            self.subject.full_name = f"Name {i}"
+            self.subject.save()
+
+    def audit_page(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("core:auditlog", args=["user"]), params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.context
+
+    def test_pages_cost_the_same_number_of_queries(self):
+        self.rename(120)
+
+        first_count, first = self.audit_page()
+        second_count, second = self.audit_page(before=first["older"])
+
+        self.assertEqual(first_count, second_count)
+        self.assertEqual(len(first["rows"]), 50)
+        self.assertLess(second["rows"][0]["history"].history_id, first["rows"][-1]["history"].history_id)
+        newest = first["rows"][0]
+        self.assertEqual(newest["changes"], [{"field": "full_name", "old": "Name 119", "new": "Name 120"}])
+
+    @override_settings(AUDIT_STORE_DIFFS=True)
+    def test_stored_diffs_skip_the_previous_version_fetch(self):
+        self.rename(3)
+        latest = self.subject.history.latest("history_id")
+        self.assertEqual(latest.changes, [{"field": "full_name", "old": "Name 2", "new": "Name 3"}])
+
+        stored_count, context = self.audit_page()
+        self.assertEqual(context["rows"][0]["changes"], latest.changes)
+
+        with self.settings(AUDIT_STORE_DIFFS=False):
+            self.subject.history.update(changes=None)
+            computed_count, _ = self.audit_page()
+        self.assertEqual(stored_count + 1, computed_count)
+
+
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class AuditExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email="audit@example.com", password="pass", role="admin")
+        cls.subject = User.objects.create_user(email="subject@example.com", full_name="Name 0")
+        for i in range(1, 26):
+            cls.subject.full_name = f"Name {i}"
+            cls.subject.save()
+
+    def test_chunks_diff_against_versions_in_earlier_chunks(self):
+        rows = list(iter_audit_rows(audit_history(User).filter(id=self.subject.id), chunk_size=10))
+
+        self.assertEqual(len(rows), 26)
+        self.assertEqual(rows[0]["changes"], [])
+        self.assertEqual(rows[10]["changes"], [{"field": "full_name", "old": "Name 9", "new": "Name 10"}])
+
+    def test_streaming_export_with_filters(self):
+        self.client.force_login(self.admin)
+        url = reverse("core:auditlog_export", args=["user"])
+
+        response = self.client.get(url, {"format": "jsonl"})
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), User.history.count())
+        self.assertEqual(json.loads(lines[-1])["object_id"], self.subject.id)
+
+        response = self.client.get(url, {"format": "csv", "end": "2000-01-01"})
+        self.assertEqual(b"".join(response.streaming_content).decode().count("\n"), 1)
+        self.assertEqual(response["Content-Type"], "text/csv")
+
+    def test_invalid_dates_are_rejected(self):
+        self.client.force_login(self.admin)
+        url = reverse("core:auditlog_export", args=["user"])
+
+        for params in ({"start": "2024-02-30"}, {"end": "yesterday"}, {"start": "2024-1-1x"}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertContains(response, "expected YYYY-MM-DD", status_code=400)
+
+
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class ConfigCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        SitePage.objects.create(allowed_income_percent=50)
+        cls.loan_type = LoanTypes.objects.create(
+            name="Green", description="test", interest_rate=10, amount_limit=100000
+        )
+
+    def setUp(self):
+        # rows rolled back by earlier tests never fired post_delete
+        config_cache.invalidate("site_page", "loan_types")
+        cache.clear()
+
+    def config_queries(self, action):
+        with CaptureQueriesContext(connection) as queries:
+            result = action()
+        tables = ("core_sitepage", "loans_loantypes")
+        return [q["sql"] for q in queries if any(table in q["sql"] for table in tables)], result
+
+    def test_index_and_apply_form_hit_the_cache(self):
+        self.client.get(reverse("core:index"))
+        queries, response = self.config_queries(lambda: self.client.get(reverse("core:index")))
+        self.assertEqual(queries, [])
+        self.assertContains(response, "Green")
+
+        data = {
+            "loan_type": self.loan_type.pk,
+            "amount": "1000",
+            "duration_months": 12,
+            "purpose": "test",
+            "monthly_income": "5000",
+            "address": "test",
+            "citizenship_number": "1",
+        }
+        ApplicationForm(data=data).is_valid()
+        queries, form = self.config_queries(lambda: ApplicationForm(data=data))
+        queries += self.config_queries(form.is_valid)[0]
+        queries += self.config_queries(lambda: str(form["loan_type"]))[0]
+        self.assertEqual(queries, [])
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data["loan_type"], self.loan_type)
+
+        form = ApplicationForm(data={**data, "amount": "4000"})
+        self.assertFalse(form.is_valid())
+
+    def test_saving_invalidates(self):
+        self.assertEqual([lt.name for lt in config_cache.active_loan_types()], ["Green"])
+
+        self.loan_type.is_active = False
+        self.loan_type.save()
+        self.assertEqual(config_cache.active_loan_types(), [])
+
+        site = SitePage.objects.get()
+        site.allowed_income_percent = 80
+        site.save()
+        self.assertEqual(config_cache.site_settings().allowed_income_percent, 80)
+
+    @override_settings(CONFIG_CACHE_TIMEOUT=3600, CONFIG_CACHE_LOCAL_TTL=30)
+    def test_a_per_process_cache_keeps_rows_no_longer_than_the_local_copy(self):
+        # other workers' locmem caches are never invalidated by this one's saves
+        config_cache.loan_types()
+
+        expires = cache._expire_info[cache.make_key("config:loan_types")]
+        self.assertLessEqual(expires - time.time(), 30)
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage",
+    PAGE_CACHE_TIMEOUT=300,
+)
+class IndexPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.loan_type = LoanTypes.objects.create(
+            name="Hydro Power", description="test", interest_rate=10, amount_limit=100000
+        )
+
+    def setUp(self):
+        config_cache.invalidate("site_page", "loan_types")
+        cache.clear()
+
+    def test_anonymous_visitors_share_one_rendering(self):
+        first = self.client.get(reverse("core:index"))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse("core:index"))
+
+        self.assertIsNotNone(first.context)
+        self.assertIsNone(second.context)  # nothing was rendered
+        self.assertEqual(first.content, second.content)
+        self.assertIn("Cookie", second["Vary"])
+
+    def test_visitors_with_a_session_bypass_the_page_cache(self):
+        self.client.get(reverse("core:index"))
+        self.client.cookies["sessionid"] = "abc"
+        self.assertIsNotNone(self.client.get(reverse("core:index")).context)
+
+    def test_loan_type_changes_show_up_immediately(self):
+        self.assertContains(self.client.get(reverse("core:index")), "Hydro Power")
+
+        self.loan_type.name = "Solar Power"
+        self.loan_type.save()
+
+        response = self.client.get(reverse("core:index"))
+        self.assertContains(response, "Solar Power")
+        self.assertNotContains(response, "Hydro Power")
+
+
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class SettingsListQueryTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email="lists@example.com", password="pass", role="admin")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def seed_users(self, role):
+        def seed(n):
+            for _ in range(n):
+                User.objects.create_user(email=f"{role}{User.objects.count()}@example.com", role=role)
+
+        return seed
+
+    def test_user_list(self):
+        self.assertQueryCountConstant(reverse("core:user_list"), self.seed_users("customer"))
+
+    def test_admin_list(self):
+        self.assertQueryCountConstant(reverse("core:admin_list"), self.seed_users("officer"))
+
+    def test_audit_log(self):
+        self.assertQueryCountConstant(
+            reverse("core:auditlog", args=["user"]), self.seed_users("customer")
+        )
+
+
+class SeedCommandTests(TestCase):
+    def seed(self, *args):
+        call_command("seed_greenloan", "--customers", "30", "--officers", "3", *args, stdout=StringIO())
+        return list(Repayment.objects.order_by("id").values_list("due_date", "amount_due", "amount_paid", "status"))
+
+    def test_same_seed_gives_the_same_portfolio(self):
+        first = self.seed()
+        self.assertTrue(first)
+        self.assertTrue(Application.objects.filter(status="rejected").exists())
+        for loan in ApprovedLoans.objects.filter(status="closed"):
+            self.assertFalse(loan.repayments.exclude(status__in=["paid", "late"]).exists())
+        # "late" is an instalment paid in full after its due date, as apply_status() has it
+        late = Repayment.objects.filter(status="late")
+        self.assertFalse(late.filter(Q(amount_paid__lt=F("amount_due")) | Q(paid_date__lte=F("due_date"))).exists())
+
+        self.assertEqual(self.seed("--clear"), first)
+        self.assertNotEqual(self.seed("--clear", "--seed", "7"), first)
+
+    def test_officers_are_required(self):
+        with self.assertRaisesMessage(CommandError, "At least one officer"):
+            call_command("seed_greenloan", "--customers", "5", "--officers", "0", stdout=StringIO())
+        self.assertFalse(Repayment.objects.exists())
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage",
+    METRICS_TOKEN="scrape-token",
+)
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email="metrics@example.com", password="pass", role="admin")
+        cls.customer = User.objects.create_user(email="customer@example.com", password="pass")
+
+    def setUp(self):
+        metrics.registry.reset()
+
+    def scrape(self):
+        response = self.client.get(reverse("core:metrics"), HTTP_AUTHORIZATION="Bearer scrape-token")
+        self.assertEqual(response.status_code, 200)
+        return {
+            line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+            for line in response.content.decode().splitlines()
+            if not line.startswith("#")
+        }
+
+    def test_requests_are_recorded_per_view(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse("accounts:dashboard"))
+        self.client.get(reverse("accounts:dashboard"))
+        self.client.get("/no-such-page/")
+
+        samples = self.scrape()
+        view = 'view="accounts:dashboard"'
+        self.assertEqual(samples[f'greenloan_responses_total{{{view},status="200"}}'], 2)
+        self.assertEqual(samples['greenloan_responses_total{view="unresolved",status="404"}'], 1)
+        self.assertEqual(samples[f"greenloan_request_seconds_count{{{view}}}"], 2)
+        self.assertEqual(samples[f'greenloan_request_seconds_bucket{{{view},le="+Inf"}}'], 2)
+        self.assertGreater(samples[f"greenloan_db_queries_sum{{{view}}}"], 0)
+        self.assertGreater(samples[f"greenloan_db_seconds_sum{{{view}}}"], 0)
+        self.assertGreater(samples[f"greenloan_template_seconds_sum{{{view}}}"], 0)
+
+    def test_totals_of_other_workers_are_added(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse("accounts:dashboard"))
+        self.client.get(reverse("accounts:dashboard"))
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            metrics.registry.shared.changed()
+            metrics.registry.shared.publish()
+            (published,) = os.listdir(directory)
+            # a recycled worker's file with the same totals
+            with open(os.path.join(directory, published)) as file, \
+                    open(os.path.join(directory, "requests-1-exited.json"), "w") as other:
+                other.write(file.read())
+            samples = self.scrape()
+
+        view = 'view="accounts:dashboard"'
+        self.assertEqual(samples[f'greenloan_responses_total{{{view},status="200"}}'], 4)
+        self.assertEqual(samples[f'greenloan_request_seconds_bucket{{{view},le="+Inf"}}'], 4)
+
+    def test_exited_workers_are_folded_into_one_file(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse("accounts:dashboard"))
+        snapshot = json.dumps(metrics.registry.snapshot())
+        metrics.registry.reset()
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            for name in ("requests-11-a.json", "requests-12-b.json", "requests-13-c.json"):
+                with open(os.path.join(directory, name), "w") as file:
+                    file.write(snapshot)
+            metrics.retire_process(11)
+            metrics.retire_process(12)
+            files = sorted(os.listdir(directory))
+            samples = self.scrape()
+
+        self.assertEqual(files, ["requests-13-c.json", "requests-retired.json"])
+        view = 'view="accounts:dashboard"'
+        # the three workers' requests, the scrape is counted after it is answered
+        self.assertEqual(samples[f'greenloan_responses_total{{{view},status="200"}}'], 3)
+        self.assertEqual(samples[f"greenloan_request_seconds_count{{{view}}}"], 3)
+
+    def test_metrics_are_for_admins_and_the_scraper_only(self):
+        url = reverse("core:metrics")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        self.client.force_login(self.customer)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage", PROFILE_KEEP=2)
+class ProfilerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email="profiler@example.com", password="pass", role="admin")
+        cls.customer = User.objects.create_user(email="customer@example.com", password="pass")
+
+    def setUp(self):
+        profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(profile_dir.cleanup)
+        self.enterContext(override_settings(PROFILE_DIR=profile_dir.name))
+        self.client.force_login(self.admin)
+
+    def test_admins_can_profile_a_request(self):
+        response = self.client.get(reverse("accounts:dashboard"), {"_profile": "cprofile"})
+
+        name = response["X-Profile"]
+        self.assertRegex(name, r"_accounts-dashboard_\d+ms\.pstats$")
+        download = self.client.get(reverse("core:profile_download", args=[name]))
+        path = os.path.join(settings.PROFILE_DIR, name)
+        with open(path, "rb") as profile:
+            self.assertEqual(b"".join(download.streaming_content), profile.read())
+        self.assertIn("get_context_data", str(pstats.Stats(path).stats))
+
+    def test_stack_sampler_is_the_default(self):
+        with override_settings(PROFILE_SAMPLE_INTERVAL=0.0001):
+            response = self.client.get(reverse("accounts:dashboard"), HTTP_X_PROFILE="1")
+
+        self.assertTrue(response["X-Profile"].endswith(".folded"))
+        with open(os.path.join(settings.PROFILE_DIR, response["X-Profile"])) as folded:
+            stack, count = folded.readline().rsplit(" ", 1)
+        self.assertIn(";", stack)
+        self.assertGreater(int(count), 0)
+
+    def test_concurrent_cprofile_requests_are_served_unprofiled(self):
+        # another thread of this worker is being profiled
+        with profiling._cprofile_lock:
+            response = self.client.get(reverse("accounts:dashboard"), {"_profile": "cprofile"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Profile"], "busy")
+        self.assertEqual(os.listdir(settings.PROFILE_DIR), [])
+
+    def test_a_profiler_already_running_is_not_an_error(self):
+        with mock.patch("cProfile.Profile.enable", side_effect=ValueError("Another profiling tool is already active")):
+            response = self.client.get(reverse("accounts:dashboard"), {"_profile": "cprofile"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Profile"], "unavailable")
+        self.assertTrue(profiling._cprofile_lock.acquire(blocking=False))
+        profiling._cprofile_lock.release()
+
+    def test_only_the_newest_profiles_are_kept(self):
+        for _ in range(3):
+            self.client.get(reverse("accounts:dashboard"), {"_profile": "1"})
+
+        response = self.client.get(reverse("core:profiles"))
+        self.assertEqual(len(response.context["profiles"]), 2)
+        self.assertEqual(len(os.listdir(settings.PROFILE_DIR)), 2)
+
+    def test_customers_are_not_profiled(self):
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse("accounts:dashboard"), {"_profile": "1"})
+
+        self.assertNotIn("X-Profile", response)
+        self.assertEqual(self.client.get(reverse("core:profiles")).status_code, 403)
+
+    def test_download_only_serves_listed_profiles(self):
+        response = self.client.get(reverse("core:profile_download", args=["..%2Fsettings.py"]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage", SLOW_QUERY_MS=1e-6)
+class SlowQueryLogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email="slow@example.com", password="pass", role="admin")
+
+    def setUp(self):
+        slow_queries.stats.reset()
+        self.client.force_login(self.admin)
+
+    def test_slow_queries_are_logged_and_ranked_per_fingerprint(self):
+        with self.assertLogs("core.slow_queries", "WARNING") as logs:
+            self.client.get(reverse("accounts:dashboard"))
+            self.client.get(reverse("accounts:dashboard"))
+
+        self.assertIn("view=accounts:dashboard role=admin fingerprint=", logs.output[-1])
+        ranked = slow_queries.stats.ranked()
+        self.assertEqual(ranked, sorted(ranked, key=lambda entry: entry["total"], reverse=True))
+        self.assertTrue(all(entry["count"] == 2 for entry in ranked if entry["views"] == [("accounts:dashboard", 2)]))
+
+        # the page's own queries are slow too
+        with self.assertLogs("core.slow_queries", "WARNING"):
+            response = self.client.get(reverse("core:slow_queries"))
+        self.assertContains(response, ranked[0]["fingerprint"])
+
+    def test_statements_differing_in_literals_share_a_fingerprint(self):
+        first = slow_queries.normalize("SELECT * FROM \"t1\" WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21")
+        second = slow_queries.normalize("SELECT *  FROM \"t1\"\nWHERE id IN (%s, %s) AND name = 'it''s' LIMIT 50")
+
+        self.assertEqual(first, 'SELECT * FROM "t1" WHERE id IN (...) AND name = ? LIMIT ?')
+        self.assertEqual(slow_queries.fingerprint(first), slow_queries.fingerprint(second))
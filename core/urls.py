@@ -12,7 +12,12 @@ from core.views import (
 from core.views import (
     AuditModelListView,
     AuditLogView,
+    AuditExportView,
     RollbackView,
+    MetricsView,
+    ProfileListView,
+    ProfileDownloadView,
+    SlowQueryListView,
 )
 
 app_name = "core"
@@ -28,6 +33,11 @@ urlpatterns = [
     path("settings/sitesetting", SitePageSettingsView.as_view(), name="site_settings"),
     path("auditlog/", AuditModelListView.as_view(), name="audit_models"),
     path("auditlog/<str:model>/", AuditLogView.as_view(), name="auditlog"),
+    path("auditlog/<str:model>/export/", AuditExportView.as_view(), name="auditlog_export"),
     path("rollback/<str:model>/<int:history_id>/", RollbackView.as_view(), name="rollback"),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
+    path("settings/profiles/", ProfileListView.as_view(), name="profiles"),
+    path("settings/profiles/<str:name>", ProfileDownloadView.as_view(), name="profile_download"),
+    path("settings/slow-queries/", SlowQueryListView.as_view(), name="slow_queries"),
 
 ]
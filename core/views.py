@@ -1,24 +1,43 @@
 from email import message
-import json
 from django.views.generic import ListView, CreateView, View, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth import get_user_model
 from django.contrib import messages
 from django.shortcuts import redirect
-from django.core.mail import send_mail
+from core.config_cache import active_loan_types, loan_types, site_settings
+from core.db import StatementTimeoutMixin
+from core.outbox import queue_mail
+from core.page_cache import cache_anonymous_page, cache_generation
+from django.utils.decorators import method_decorator
 from accounts.forms import SimpleUserCreationForm
 from core.models import SitePage
 from core.forms import SimpleAdminCreationForm
 from greenloan import settings
 from loans.models import LoanTypes, Document, Application
 from django.shortcuts import get_object_or_404
-from django.apps import apps
-from django.http import HttpResponseForbidden
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse,
+)
+from django.utils.crypto import constant_time_compare
+from core.metrics import registry
+from core.profiling import list_profiles, profile_path
+from core import slow_queries
+from django.utils.dateparse import parse_date
+from core.audit import (
+    EXPORT_FORMATS,
+    attach_changes,
+    audit_history,
+    get_audit_model,
+    iter_audit_rows,
+    iter_export_lines,
+    with_previous_version,
+)
 
 
 User = get_user_model()
 
 
+@method_decorator(cache_anonymous_page, name="dispatch")
 class IndexView(TemplateView):
     """This views return the index page for the application"""
 
@@ -31,9 +50,12 @@ class IndexView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["LoanTypes"] = LoanTypes.objects.filter(is_active = True)
+        context["LoanTypes"] = active_loan_types()
         context["loan_detail"] = ['Loan Amount', 'Repayment Period', 'Interest Rate', 'Application Fee']
         context["features"] = ['Secure', 'Fast', 'Low Interest', 'Trusted']
+        # template fragment cache settings
+        context["fragment_cache_timeout"] = settings.FRAGMENT_CACHE_TIMEOUT
+        context["cache_generation"] = cache_generation()
         return context
 
 
@@ -57,24 +79,21 @@ class ContactView(TemplateView):
         """
 
         # Send email to company/admin
-        send_mail(
+        queue_mail(
             subject=admin_subject,
             message=admin_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=[settings.EMAIL_HOST_USER],  # your company email
-            fail_silently=False,
         )
 
         # Optional: Send confirmation email to sender
         sender_subject = "Thank you for contacting GreenLoan"
         sender_message = f"Hi {name},\n\nThank you for reaching out. We received your message and will respond soon.\n\nYour message:\n{message}\n\nBest regards,\nGreenLoan Team"
 
-        send_mail(
+        queue_mail(
             subject=sender_subject,
             message=sender_message,
             from_email=settings.EMAIL_HOST_USER,
             recipient_list=[email],
-            fail_silently=False,
         )
 
         messages.success(request, "Your message has been sent successfully!")
@@ -88,7 +107,7 @@ class SystemSettingsListView(LoginRequiredMixin, UserPassesTestMixin, TemplateVi
         return self.request.user.role == "admin"
 
 
-class UserListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class UserListView(StatementTimeoutMixin, LoginRequiredMixin, UserPassesTestMixin, ListView):
     model = User
     template_name = "core/user_list.html"
     context_object_name = "users"
@@ -190,11 +209,9 @@ class SitePageSettingsView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["allowed_precent"] = SitePage.objects.first()
-        loan_types = LoanTypes.objects.all()
-        for loan in loan_types:
-            loan.documents_json = json.dumps(loan.required_documents)
-        context["loan_types"] = loan_types
+        context["allowed_precent"] = site_settings()
+        # documents_json is serialised once per cache fill
+        context["loan_types"] = loan_types()
         context["document_choices"] = Document.DOCUMENT_TYPES
         return context
     
@@ -265,77 +282,88 @@ class AuditModelListView(LoginRequiredMixin, TemplateView):
             ]
         }
         
-class AuditLogView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+AUDIT_PAGE_SIZE = 50
+
+
+class AuditLogView(StatementTimeoutMixin, LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    """
+    Newest first, keyset-paginated on history_id (?before=<history_id>), so a
+    deep page is as cheap as the first. A page costs the page query, which also
+    finds each row's previous version, plus one query fetching those previous
+    versions for rows without a stored diff.
+    """
+
     template_name = "audit_logs/audit_log.html"
-    context_object_name = "rows"
 
     def test_func(self):
         return self.request.user.role == "admin"
 
-    def get_queryset(self):
-        model = self.kwargs["model"]
-        model_app_map = {
-        "application": "loans",
-        "user": "accounts", 
-        "loantypes": "loans",
-        "loan": "loans"
-        }
-        app_name = model_app_map.get(model, "loans")
-        model_cls = apps.get_model(app_name, model.capitalize())
-        if not app_name:
-            return messages.error(f"No app found for model '{model}'")
-        return model_cls.history.select_related("history_user")
-
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         model = self.kwargs["model"]
-        model_app_map = {
-            "application": "loans",
-            "user": "accounts", 
-            "loantypes": "loans"
-        }
-        app_name = model_app_map.get(model, "loans")
-        model_cls = apps.get_model(app_name, model)
-
-        rows = []
-        for h in context["rows"]:
-            changes = []
-
-            if h.prev_record:
-                for field in model_cls._meta.fields:
-                    name = field.name
-                    old = getattr(h.prev_record, name, None)
-                    new = getattr(h, name, None)
-                    if old != new:
-                        changes.append({
-                            "field": name,
-                            "old": old,
-                            "new": new,
-                        })
-
-            rows.append({
-                "history": h,
-                "changes": changes,
-                "model": model,
-            })
+        model_cls = get_audit_model(model)
+        page = with_previous_version(
+            model_cls.history.select_related("history_user")
+        ).order_by("-history_id")
+        before = self.request.GET.get("before", "")
+        if before.isdigit():
+            page = page.filter(history_id__lt=int(before))
+        page = list(page[:AUDIT_PAGE_SIZE + 1])
+        has_more = len(page) > AUDIT_PAGE_SIZE
+        page = attach_changes(page[:AUDIT_PAGE_SIZE])
+
+        rows = [{"history": h, "changes": h.audit_changes, "model": model} for h in page]
 
         context["rows"] = rows
+        context["model"] = model
         context["model_name"] = model_cls.__name__
+        context["older"] = page[-1].history_id if has_more else None
+        context["is_first_page"] = not before.isdigit()
         return context
     
+class AuditExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Stream a model's audit history as CSV or JSON lines, oldest first.
+    Filters: ?start=YYYY-MM-DD&end=YYYY-MM-DD&user=<email>&format=csv|jsonl
+    """
+
+    def test_func(self):
+        return self.request.user.role == "admin"
+
+    def get(self, request, model):
+        model_cls = get_audit_model(model)
+        export_format = request.GET.get("format", "csv")
+        if export_format not in EXPORT_FORMATS:
+            export_format = "csv"
+
+        dates = dict.fromkeys(["start", "end"])
+        for name in dates:
+            value = request.GET.get(name)
+            if not value:
+                continue
+            try:
+                dates[name] = parse_date(value)
+            except ValueError:  # well formed, but no such day
+                pass
+            # parse_date() returns None for anything else, which would drop the filter
+            if dates[name] is None:
+                return HttpResponseBadRequest(f"Invalid {name} date '{value}', expected YYYY-MM-DD")
+
+        history = audit_history(model_cls, **dates, user=request.GET.get("user"))
+        response = StreamingHttpResponse(
+            iter_export_lines(iter_audit_rows(history), export_format),
+            content_type=EXPORT_FORMATS[export_format],
+        )
+        response["Content-Disposition"] = f'attachment; filename="audit-{model}.{export_format}"'
+        return response
+
+
 class RollbackView(LoginRequiredMixin, View):
     def post(self, request, model, history_id):
         if request.user.role != "admin":
             return HttpResponseForbidden()
         
-        # Add app mapping here
-        model_app_map = {
-            "application": "loans",
-            "user": "accounts", 
-            "loantypes": "loans"
-        }
-        app_name = model_app_map.get(model, "loans")
-        model_cls = apps.get_model(app_name, model.capitalize())
+        model_cls = get_audit_model(model)
         
         # Get the specific historical record
         try:
@@ -349,4 +377,60 @@ class RollbackView(LoginRequiredMixin, View):
             request,
             f"{model_cls.__name__} rolled back successfully"
         )
-        return redirect(request.META.get("HTTP_REFERER", "/"))
\ No newline at end of file
+        return redirect(request.META.get("HTTP_REFERER", "/"))
+
+
+class MetricsView(View):
+    """Request metrics for Prometheus: admins, or a scraper with the METRICS_TOKEN bearer token."""
+
+    def get(self, request):
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        allowed = (settings.METRICS_TOKEN and constant_time_compare(token, settings.METRICS_TOKEN)) or (
+            request.user.is_authenticated and request.user.role == "admin"
+        )
+        if not allowed:
+            return HttpResponseForbidden()
+        return HttpResponse(
+            registry.render() + slow_queries.stats.render(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+
+class ProfileListView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    """Request profiles recorded with ?_profile= (core.profiling)."""
+
+    template_name = "core/profiles.html"
+
+    def test_func(self):
+        return self.request.user.role == "admin"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["profiles"] = list_profiles()
+        return context
+
+
+class SlowQueryListView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    """Slow statements of this process by total time (core.slow_queries)."""
+
+    template_name = "core/slow_queries.html"
+
+    def test_func(self):
+        return self.request.user.role == "admin"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["queries"] = slow_queries.stats.ranked()
+        context["threshold"] = settings.SLOW_QUERY_MS
+        return context
+
+
+class ProfileDownloadView(LoginRequiredMixin, UserPassesTestMixin, View):
+    def test_func(self):
+        return self.request.user.role == "admin"
+
+    def get(self, request, name):
+        path = profile_path(name)
+        if path is None:
+            raise Http404("No such profile")
+        return FileResponse(open(path, "rb"), as_attachment=True, filename=name)
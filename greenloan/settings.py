@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 from pathlib import Path
 import environ
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -72,6 +73,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so its timings cover the rest of the stack
+    "core.metrics.RequestMetricsMiddleware",
+    "core.slow_queries.SlowQueryMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -85,6 +89,7 @@ MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "allauth.account.middleware.AccountMiddleware",  # google login middleware
+    "core.profiling.ProfilerMiddleware",  # ?_profile=1 (sampler) or cprofile, for admins
 ]
 
 ROOT_URLCONF = "greenloan.urls"
@@ -119,6 +124,33 @@ AUTH_USER_MODEL = "accounts.User"
 
 DATABASES = {"default": env.db("DATABASE_URL")}
 
+# keep each worker thread's connection open for this many seconds (0: a new
+# connection per request), checking it is still alive before reusing it
+DATABASES["default"]["CONN_MAX_AGE"] = env.int("DB_CONN_MAX_AGE", default=600)
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = env.bool("DB_CONN_HEALTH_CHECKS", default=True)
+
+# PostgreSQL: cancel statements running longer than this many ms (0: never).
+# DB_STATEMENT_TIMEOUT_MS applies to every connection, management commands and
+# migrations included, so it is off unless set; the report views have their
+# own budget (core/db.py). Behind PgBouncer in transaction mode server-side
+# cursors must be turned off.
+DB_STATEMENT_TIMEOUT_MS = env.int("DB_STATEMENT_TIMEOUT_MS", default=0)
+VIEW_STATEMENT_TIMEOUT_MS = env.int("VIEW_STATEMENT_TIMEOUT_MS", default=5000)
+if DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql":
+    DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = env.bool("DB_PGBOUNCER", default=False)
+    DATABASES["default"].setdefault("OPTIONS", {})
+    DATABASES["default"]["OPTIONS"].setdefault("connect_timeout", env.int("DB_CONNECT_TIMEOUT", default=5))
+    if DB_STATEMENT_TIMEOUT_MS:
+        DATABASES["default"]["OPTIONS"].setdefault("options", f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}")
+
+# Cache
+# locmemcache:// (single process only: runserver, tests),
+# filecache:///var/tmp/greenloan-cache (one node, shared by its workers, the
+# gunicorn.conf.py default) or redis://host:6379/1 (several nodes, needs the
+# redis package). The page and config caches are invalidated through it, so
+# every process serving the site must share it.
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -203,3 +235,47 @@ X_FRAME_OPTIONS = "SAMEORIGIN"
 ESEWA_PAYMENT_URL = "https://rc-epay.esewa.com.np/api/epay/main/v2/form"
 ESEWA_MERCHANT_CODE = "EPAYTEST"
 ESEWA_SECRET_CODE = "8gBm/:&EnhH.1/q"
+
+# loan repayment schedule: "reducing" (EMI on outstanding balance) or "flat"
+LOAN_INTEREST_METHOD = env("LOAN_INTEREST_METHOD", default="reducing")
+
+# write a "created" history row for every generated instalment; off leaves
+# one history row per approval instead of one per instalment
+HISTORY_REPAYMENT_SCHEDULE = env.bool("HISTORY_REPAYMENT_SCHEDULE", default=True)
+
+# store each history row's diff when it is written (one extra indexed read per
+# save) instead of diffing on every audit log page view
+AUDIT_STORE_DIFFS = env.bool("AUDIT_STORE_DIFFS", default=False)
+
+# SitePage / LoanTypes cache (core/config_cache.py), seconds in the shared
+# cache and in each process. With a shared CACHE_URL changes reach the other
+# processes within CONFIG_CACHE_LOCAL_TTL; a locmem cache keeps rows no longer
+# than that either, since edits in one process never invalidate it elsewhere
+CONFIG_CACHE_TIMEOUT = env.int("CONFIG_CACHE_TIMEOUT", default=3600)
+CONFIG_CACHE_LOCAL_TTL = env.int("CONFIG_CACHE_LOCAL_TTL", default=30)
+
+# public index: full page for visitors without a session, fragments for everyone else
+PAGE_CACHE_TIMEOUT = env.int("PAGE_CACHE_TIMEOUT", default=300)
+FRAGMENT_CACHE_TIMEOUT = env.int("FRAGMENT_CACHE_TIMEOUT", default=3600)
+
+# per-view request metrics (core/metrics.py), served at /metrics/ to admins or
+# to scrapers sending "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_ENABLED = env.bool("METRICS_ENABLED", default=True)
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+# where each process writes its metric totals for the others to add up; set
+# by gunicorn.conf.py, leave empty for a single process
+METRICS_DIR = env("METRICS_DIR", default="")
+
+# log queries slower than this many ms (0 turns the log off); on PostgreSQL
+# optionally keep the plan of the first slow run of each statement
+SLOW_QUERY_MS = env.float("SLOW_QUERY_MS", default=200)
+SLOW_QUERY_EXPLAIN = env.bool("SLOW_QUERY_EXPLAIN", default=False)
+
+# admin request profiles (core/profiling.py): where they are kept, how many,
+# and the stack sampler's interval in seconds
+PROFILE_DIR = env("PROFILE_DIR", default=os.path.join(tempfile.gettempdir(), "greenloan-profiles"))
+PROFILE_KEEP = env.int("PROFILE_KEEP", default=50)
+PROFILE_SAMPLE_INTERVAL = env.float("PROFILE_SAMPLE_INTERVAL", default=0.001)
+
+# face matching backend for KYC self verification, imported lazily by the KYC worker
+KYC_FACE_MATCHER = env("KYC_FACE_MATCHER", default="kyc.face.DeepFaceMatcher")
@@ -0,0 +1,91 @@
+"""
+gunicorn settings. gunicorn reads this file from the working directory, so a
+plain `gunicorn` in the project root serves the site (the Dockerfile's CMD).
+
+Everything can be overridden from the environment:
+
+GUNICORN_WORKER_CLASS  gthread (default), sync, or uvicorn to serve
+                       greenloan.asgi (needs `pip install uvicorn-worker`)
+GUNICORN_WORKERS       default 2 x CPU cores + 1
+GUNICORN_THREADS       threads per gthread worker, default 4
+GUNICORN_TIMEOUT       seconds a request may take before its worker is
+                       restarted, default 60
+GUNICORN_BIND          default 0.0.0.0:8000
+METRICS_DIR            where the workers share their /metrics/ totals,
+                       emptied on start, an exited worker's folded into one file
+CACHE_URL              default a file cache shared by the workers, emptied on
+                       start; redis://... when several nodes serve the site
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+WORKER_CLASSES = {
+    "sync": "sync",
+    "gthread": "gthread",
+    "uvicorn": "uvicorn_worker.UvicornWorker",
+}
+
+worker_type = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+worker_class = WORKER_CLASSES[worker_type]
+wsgi_app = "greenloan.asgi:application" if worker_type == "uvicorn" else "greenloan.wsgi:application"
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 4)) if worker_type == "gthread" else 1
+
+# import Django once in the master, the workers share those pages copy-on-write
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+# face matching runs in the KYC worker, requests only upload the images, so
+# the timeout only has to cover slow uploads and the heaviest report pages
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+# in-flight requests (and KYC uploads) get this long to finish on a restart
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+
+# recycle workers now and then, staggered so they do not restart together
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = max_requests // 10
+
+# heartbeat files in memory rather than on the container's overlay filesystem
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = "-"
+errorlog = "-"
+
+# workers write their request metrics here, /metrics/ adds them up (core/metrics.py)
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "greenloan-metrics"))
+
+# the settings default to a per-process cache, with several workers a config
+# edit or page cache bump would only reach the worker that saved it
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "greenloan-cache")
+os.environ.setdefault("CACHE_URL", f"filecache://{DEFAULT_CACHE_DIR}")
+
+
+def on_starting(server):
+    # totals from the previous run would be added to the new one
+    shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
+    # rows edited while the server was down must not be served from the old cache
+    if os.environ["CACHE_URL"] == f"filecache://{DEFAULT_CACHE_DIR}":
+        shutil.rmtree(DEFAULT_CACHE_DIR, ignore_errors=True)
+
+
+def child_exit(server, worker):
+    # a recycled worker leaves its metric files behind, fold them into the
+    # retired totals so there is one file per live worker plus one
+    try:
+        import django
+        from django.apps import apps
+
+        if not apps.ready:  # without preload_app
+            os.environ.setdefault("DJANGO_SETTINGS_MODULE", "greenloan.settings")
+            django.setup()
+        from core.metrics import retire_process
+
+        retire_process(worker.pid)
+    except Exception:
+        server.log.exception("Could not fold the metrics of worker %s", worker.pid)
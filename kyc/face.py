@@ -0,0 +1,168 @@
+"""
+Face matching backends.
+
+DeepFace pulls in TensorFlow, which costs seconds of import time and hundreds
+of MB per process. Nothing in the URLconf or the web views imports it: the
+backend is built on first use, which in practice only happens in the KYC
+worker (see kyc/worker.py).
+
+Passport photos rarely change between attempts, so their embeddings are
+cached in FaceEmbedding keyed by content hash. A live attempt then only
+embeds the selfie and compares two vectors.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from kyc.models import FaceEmbedding
+
+FACE_MODEL = "VGG-Face"
+DETECTOR_BACKEND = "opencv"
+DISTANCE_METRIC = "cosine"
+
+
+class DeepFaceMatcher:
+    """Compares faces with DeepFace, importing it on first use."""
+
+    def __init__(self, model_name=FACE_MODEL, detector_backend=DETECTOR_BACKEND):
+        self.model_name = model_name
+        self.detector_backend = detector_backend
+        self._deepface = None
+        self._threshold = None
+
+    @property
+    def deepface(self):
+        if self._deepface is None:
+            from deepface import DeepFace
+
+            self._deepface = DeepFace
+        return self._deepface
+
+    @property
+    def threshold(self):
+        if self._threshold is None:
+            from deepface.modules.verification import find_threshold
+
+            self._threshold = find_threshold(self.model_name, DISTANCE_METRIC)
+        return self._threshold
+
+    def warm_up(self):
+        """Import TensorFlow and build the model now rather than on the first job."""
+        self.deepface.build_model(self.model_name)
+
+    def verify(self, reference_path, probe_path):
+        """Return {"verified": bool, "distance": float} for two image paths."""
+        result = self.deepface.verify(
+            img1_path=reference_path,
+            img2_path=probe_path,
+            model_name=self.model_name,
+            detector_backend=self.detector_backend,
+            distance_metric=DISTANCE_METRIC,
+            enforce_detection=False,
+        )
+        return {"verified": result.get("verified", False), "distance": result.get("distance", 0)}
+
+    def represent(self, path):
+        """Detect the face in an image and return its embedding as a float32 vector."""
+        import numpy as np
+
+        faces = self.deepface.represent(
+            img_path=path,
+            model_name=self.model_name,
+            detector_backend=self.detector_backend,
+            enforce_detection=False,
+        )
+        return np.asarray(faces[0]["embedding"], dtype=np.float32)
+
+    def compare(self, reference, probe):
+        """Cosine distance of two embeddings, same verdict as verify()."""
+        import numpy as np
+
+        distance = float(
+            1 - np.dot(reference, probe) / (np.linalg.norm(reference) * np.linalg.norm(probe))
+        )
+        return {"verified": distance <= self.threshold, "distance": distance}
+
+
+_matcher = None
+
+
+def get_face_matcher():
+    """The configured backend (settings.KYC_FACE_MATCHER), one instance per process."""
+    global _matcher
+    if _matcher is None:
+        _matcher = import_string(settings.KYC_FACE_MATCHER)()
+    return _matcher
+
+
+def file_hash(file):
+    """sha256 of an uploaded or stored file, read in chunks."""
+    digest = hashlib.sha256()
+    file.open("rb")
+    try:
+        for chunk in file.chunks():
+            digest.update(chunk)
+    finally:
+        file.seek(0)
+    return digest.hexdigest()
+
+
+def register_reference_photo(user, photo):
+    """
+    Called when a passport photo is uploaded: record its hash so the KYC worker
+    embeds it while idle, and drop embeddings of the user's previous photos.
+    """
+    content_hash = file_hash(photo)
+    FaceEmbedding.objects.filter(user=user).exclude(content_hash=content_hash).delete()
+    FaceEmbedding.objects.get_or_create(
+        user=user,
+        content_hash=content_hash,
+        model_name=get_face_matcher().model_name,
+    )
+    return content_hash
+
+
+def reference_embedding(user, matcher):
+    """The user's passport photo embedding, computed and stored on a cache miss."""
+    import numpy as np
+
+    photo = user.passport_photo_url
+    content_hash = file_hash(photo)
+    cached = (
+        FaceEmbedding.objects.filter(user=user, content_hash=content_hash, model_name=matcher.model_name)
+        .values_list("vector", flat=True)
+        .first()
+    )
+    if cached:
+        return np.frombuffer(bytes(cached), dtype=np.float32)
+
+    vector = matcher.represent(photo.path)
+    FaceEmbedding.objects.update_or_create(
+        user=user,
+        content_hash=content_hash,
+        model_name=matcher.model_name,
+        defaults={"vector": vector.tobytes()},
+    )
+    return vector
+
+
+def precompute_reference_embeddings(matcher, limit=1):
+    """Fill in embeddings registered at upload time, the worker calls this when idle."""
+    pending = (
+        FaceEmbedding.objects.filter(vector__isnull=True, model_name=matcher.model_name)
+        .select_related("user")
+        .order_by("created_at")[:limit]
+    )
+    done = 0
+    for row in pending:
+        photo = row.user.passport_photo_url
+        if not photo or file_hash(photo) != row.content_hash:
+            # the photo changed again since it was registered
+            row.delete()
+            continue
+        row.vector = matcher.represent(photo.path).tobytes()
+        row.save(update_fields=["vector"])
+        done += 1
+    return done
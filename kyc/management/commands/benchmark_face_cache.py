@@ -0,0 +1,50 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from kyc.face import get_face_matcher
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-attempt face verification latency without a cached passport "
+        "embedding (both images detected and embedded) and with one (selfie only)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("passport", help="Path to a passport photo.")
+        parser.add_argument("selfie", help="Path to a live capture of the same person.")
+        parser.add_argument("--runs", type=int, default=10)
+
+    def timed(self, runs, attempt):
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = attempt()
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples), result
+
+    def handle(self, *args, **options):
+        matcher = get_face_matcher()
+        passport, selfie, runs = options["passport"], options["selfie"], options["runs"]
+
+        start = time.perf_counter()
+        try:
+            matcher.warm_up()
+        except ImportError as e:
+            self.stderr.write(f"face matcher not available here ({e})")
+            return
+        self.stdout.write(f"model load  {(time.perf_counter() - start) * 1000:9.1f} ms (once per worker)")
+
+        cold, cold_result = self.timed(
+            runs, lambda: matcher.compare(matcher.represent(passport), matcher.represent(selfie))
+        )
+        reference = matcher.represent(passport)
+        warm, warm_result = self.timed(
+            runs, lambda: matcher.compare(reference, matcher.represent(selfie))
+        )
+
+        self.stdout.write(f"cold cache  {cold:9.1f} ms/attempt  distance {cold_result['distance']:.4f}")
+        self.stdout.write(f"warm cache  {warm:9.1f} ms/attempt  distance {warm_result['distance']:.4f}")
+        self.stdout.write(f"speedup     {cold / warm:9.2f}x")
@@ -0,0 +1,53 @@
+import multiprocessing
+import signal
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from kyc.worker import work
+
+
+def _child(stop_event, poll_interval, stale_after, once):
+    # the parent handles Ctrl+C / SIGTERM and tells the children through the event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    work(stop_event, poll_interval=poll_interval, stale_after=stale_after, once=once)
+
+
+class Command(BaseCommand):
+    help = "Run a pool of face verification workers that process queued KYCVerification jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=1, help="Worker processes, each keeps its own model warm.")
+        parser.add_argument("--poll-interval", type=float, default=1.0)
+        parser.add_argument("--stale-after", type=int, default=600, help="Seconds before a processing job is requeued.")
+        parser.add_argument("--once", action="store_true", help="Drain the queue and exit.")
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(seconds=options["stale_after"])
+        stop_event = multiprocessing.Event()
+
+        def stop(signum, frame):
+            self.stdout.write("Stopping KYC workers after their current job...")
+            stop_event.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        # children must open their own database connections
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(
+                target=_child,
+                args=(stop_event, options["poll_interval"], stale_after, options["once"]),
+                name=f"kyc-worker-{i}",
+            )
+            for i in range(options["processes"])
+        ]
+        for process in workers:
+            process.start()
+        self.stdout.write(f"Started {len(workers)} KYC worker process(es).")
+
+        for process in workers:
+            process.join()
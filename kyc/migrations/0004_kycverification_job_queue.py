@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kyc', '0003_kycverification_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kycverification',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='kycverification',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='kycverification',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='kycverification',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        # attempts made before the worker existed were verified inline
+        migrations.AddField(
+            model_name='kycverification',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='done', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='kycverification',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='kycverification',
+            index=models.Index(fields=['status', 'created_at'], name='kyc_job_queue_idx'),
+        ),
+    ]
@@ -2,6 +2,15 @@ from django.db import models
 from django.conf import settings
 
 class KYCVerification(models.Model):
+    """A live face verification attempt, also the job row the KYC worker picks up."""
+
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("processing", "Processing"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='kyc_verification_attempts', null=True, blank=True)
     citizenship_image = models.ImageField(upload_to='kyc/citizenship/')
     selfie_image = models.ImageField(upload_to='kyc/selfie/')
@@ -13,7 +22,43 @@ class KYCVerification(models.Model):
     left_turn_detected = models.BooleanField(default=False)
     right_turn_detected = models.BooleanField(default=False)
 
+    # worker queue state
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="kyc_job_queue_idx"),
+        ]
+
+    def __str__(self):
+        return f"KYC #{self.id}"
+
+    @property
+    def is_finished(self):
+        return self.status in ("done", "failed")
+
+
+class FaceEmbedding(models.Model):
+    """
+    Reference embedding of a user's passport photo, keyed by the photo's
+    content hash so each photo is detected and embedded only once.
+    """
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="face_embeddings")
+    content_hash = models.CharField(max_length=64)
+    model_name = models.CharField(max_length=50)
+    # float32 bytes, empty until the KYC worker computes it
+    vector = models.BinaryField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        unique_together = ("user", "content_hash", "model_name")
+
     def __str__(self):
-        return f"KYC #{self.id}"
\ No newline at end of file
+        return f"Embedding {self.content_hash[:12]} ({self.model_name})"
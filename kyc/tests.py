@@ -1,3 +1,162 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from kyc import face
+from kyc.face import get_face_matcher, reference_embedding
+from kyc.models import FaceEmbedding, KYCVerification
+from kyc.worker import MAX_ATTEMPTS, claim_next_job, requeue_stale_jobs, run_job
+
+
+class FakeMatcher:
+    """Embeds an image as (length, byte sum) and counts the embeddings it computes."""
+
+    def __init__(self, model_name="fake"):
+        self.model_name = model_name
+        self.represented = []
+
+    def warm_up(self):
+        pass
+
+    def represent(self, path):
+        self.represented.append(path)
+        with open(path, "rb") as file:
+            data = file.read()
+        return np.array([len(data), sum(data)], dtype=np.float32)
+
+    def compare(self, reference, probe):
+        distance = 0.0 if np.array_equal(reference, probe) else 1.0
+        return {"verified": distance == 0, "distance": distance}
+
+
+@override_settings(KYC_FACE_MATCHER="kyc.tests.FakeMatcher")
+class KYCTestCase(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        # built from the overridden KYC_FACE_MATCHER, not the process-wide instance
+        self.enterContext(mock.patch.object(face, "_matcher", None))
+
+        self.matcher = get_face_matcher()
+        self.user = User.objects.create_user(email="kyc@example.com")
+        self.user.passport_photo_url.save("passport.jpg", ContentFile(b"face-a"))
+
+    def queue_job(self, selfie=b"face-a"):
+        return KYCVerification.objects.create(user=self.user, selfie_image=ContentFile(selfie, name="selfie.jpg"))
+
+
+class KYCQueueTests(KYCTestCase):
+    def test_each_job_is_claimed_once(self):
+        first, second = self.queue_job(), self.queue_job()
+
+        self.assertEqual(claim_next_job(), first)
+        self.assertEqual(claim_next_job(), second)
+        self.assertIsNone(claim_next_job())
+        self.assertEqual(
+            list(KYCVerification.objects.order_by("id").values_list("status", "attempts")),
+            [("processing", 1), ("processing", 1)],
+        )
+
+    def test_a_lost_race_moves_on_to_the_next_job(self):
+        first, second = self.queue_job(), self.queue_job()
+        raced = []
+
+        def other_worker(execute, sql, params, many, context):
+            # another worker claims the first job between our SELECT and UPDATE
+            if sql.startswith("UPDATE") and not raced:
+                raced.append(sql)
+                KYCVerification.objects.filter(pk=first.pk).update(status="processing")
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(other_worker):
+            claimed = claim_next_job()
+
+        self.assertEqual(claimed, second)
+        first.refresh_from_db()
+        self.assertEqual(first.attempts, 0)
+
+    def test_stale_jobs_are_requeued(self):
+        stale, running = self.queue_job(), self.queue_job()
+        KYCVerification.objects.update(status="processing", attempts=1, started_at=timezone.now())
+        KYCVerification.objects.filter(pk=stale.pk).update(started_at=timezone.now() - timedelta(minutes=20))
+
+        self.assertEqual(requeue_stale_jobs(timedelta(minutes=10)), 1)
+
+        stale.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual(stale.status, "queued")
+        self.assertEqual(running.status, "processing")
+        self.assertEqual(claim_next_job(), stale)
+
+    def test_jobs_fail_after_max_attempts(self):
+        job = self.queue_job()
+        for _ in range(MAX_ATTEMPTS):
+            self.assertEqual(claim_next_job(), job)
+            # the worker dies mid-verification
+            KYCVerification.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=1))
+            requeue_stale_jobs(timedelta(minutes=10))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.attempts, MAX_ATTEMPTS)
+        self.assertTrue(job.error)
+        self.assertIsNone(claim_next_job())
+
+    def test_a_matching_selfie_verifies_the_user(self):
+        self.queue_job()
+
+        job = run_job(claim_next_job(), self.matcher)
+
+        self.assertEqual((job.status, job.verified, job.confidence), ("done", True, 100))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.kyc_status, "verified")
+        self.assertEqual(self.user.kyc_verified_by, self.user)
+        self.assertIsNotNone(self.user.kyc_verified_at)
+
+    def test_a_different_face_rejects_the_user(self):
+        self.queue_job(selfie=b"face-b")
+
+        job = run_job(claim_next_job(), self.matcher)
+
+        self.assertEqual((job.status, job.verified), ("done", False))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.kyc_status, "rejected")
+
+
+class FaceEmbeddingCacheTests(KYCTestCase):
+    def test_a_cache_hit_does_not_run_the_model(self):
+        first = reference_embedding(self.user, self.matcher)
+        second = reference_embedding(self.user, self.matcher)
+
+        self.assertEqual(len(self.matcher.represented), 1)
+        np.testing.assert_array_equal(first, second)
+        self.assertEqual(FaceEmbedding.objects.filter(user=self.user).count(), 1)
+
+    def test_a_new_passport_photo_misses_the_cache(self):
+        reference_embedding(self.user, self.matcher)
+        self.user.passport_photo_url.save("passport.jpg", ContentFile(b"face-b"))
+
+        vector = reference_embedding(self.user, self.matcher)
+
+        self.assertEqual(len(self.matcher.represented), 2)
+        np.testing.assert_array_equal(vector, self.matcher.represent(self.user.passport_photo_url.path))
+        self.assertEqual(FaceEmbedding.objects.filter(user=self.user).count(), 2)
+
+    def test_another_model_misses_the_cache(self):
+        reference_embedding(self.user, self.matcher)
+        other = FakeMatcher(model_name="other")
+
+        reference_embedding(self.user, other)
+
+        self.assertEqual(len(other.represented), 1)
+        self.assertEqual(
+            set(FaceEmbedding.objects.filter(user=self.user).values_list("model_name", flat=True)), {"fake", "other"}
+        )
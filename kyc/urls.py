@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import KYCVerificationView, KYCResultView
+from .views import KYCVerificationView, KYCResultView, KYCJobStatusView
 
 app_name="kyc"
 
 urlpatterns = [
     path('kycselfverify/', KYCVerificationView.as_view(), name='kyc_verify'),
     path("result/",KYCResultView.as_view(),name="kyc_result" ),
+    path("result/<int:pk>/status/", KYCJobStatusView.as_view(), name="kyc_status"),
 ]
\ No newline at end of file
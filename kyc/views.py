@@ -1,16 +1,15 @@
 import base64
 
 from django.contrib import messages
-from django.contrib.auth import get_user_model, login, update_session_auth_hash
+from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
-from django.shortcuts import redirect, render
-from django.utils import timezone
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 from django.views import View
 from django.views.generic.edit import FormView
 from django.contrib.auth.mixins import LoginRequiredMixin
 
-from deepface import DeepFace
-
 from .forms import LiveKYCForm
 from .models import KYCVerification
 
@@ -50,61 +49,19 @@ class KYCVerificationView(LoginRequiredMixin, FormView):
                 base64.b64decode(imgstr), name=f"live_selfie.{ext}"
             )
 
+            # the face match runs in the KYC worker pool, see kyc/worker.py
             kyc = KYCVerification.objects.create(
                 user=user,
                 selfie_image=selfie_file,
                 blink_detected=True,
                 left_turn_detected=True,
                 right_turn_detected=True,
+                status="queued",
             )
 
-            passport_path = user.passport_photo_url.path
-
-            selfie_path = kyc.selfie_image.path
-
-            result = DeepFace.verify(
-                img1_path=passport_path,
-                img2_path=selfie_path,
-                detector_backend="opencv",
-                enforce_detection=False,
-            )
-
-            verified = result.get("verified", False)
-
-            distance = result.get("distance", 0)
-
-            confidence = round((1 - distance) * 100, 2)
-
-            kyc.verified = verified
-            kyc.confidence = confidence
-            kyc.save()
-
-            # UPDATE USER KYC STATUS
-            if verified:
-                user.kyc_status = "verified"
-                user.kyc_verified_at = timezone.now()
-                # Set verifier to the user performing verification (self verification here)
-                user.kyc_verified_by = self.request.user
-                user.save()
-
-                # Refresh authentication session to prevent logout during redirect
-                update_session_auth_hash(self.request, user)
-                messages.success(self.request, "KYC Verification Successful!")
-            else:
-                user.kyc_status = "rejected"
-                user.save()
-                messages.error(
-                    self.request, "Face Verification Failed. Please try again."
-                )
-
-            self.request.session["verified"] = verified
-            self.request.session["confidence"] = confidence
-            self.request.session["passport_photo"] = user.passport_photo_url.url
-            self.request.session["selfie"] = kyc.selfie_image.url
-            # Ensure session changes are persisted before redirect
-            self.request.session.modified = True
-            self.request.session.save()
-            return redirect("kyc:kyc_result")
+            self.request.session["kyc_job_id"] = kyc.id
+            messages.info(self.request, "Your live capture is being verified.")
+            return redirect(f"{reverse('kyc:kyc_result')}?job={kyc.id}")
 
         except Exception as e:
 
@@ -121,11 +78,40 @@ class KYCResultView(LoginRequiredMixin, View):
 
     def get(self, request):
 
+        job_id = request.GET.get("job") or request.session.get("kyc_job_id")
+        job = KYCVerification.objects.filter(pk=job_id, user=request.user).first() if job_id else None
+
+        if job is None:
+            messages.error(request, "No KYC verification found.")
+            return redirect("kyc:kyc_verify")
+
         context = {
-            "verified": request.session.get("verified"),
-            "confidence": request.session.get("confidence"),
-            "passport_photo": request.session.get("passport_photo"),
-            "selfie": request.session.get("selfie"),
+            "job": job,
+            "finished": job.is_finished,
+            "failed": job.status == "failed",
+            "verified": job.verified,
+            "confidence": job.confidence,
+            "passport_photo": request.user.passport_photo_url.url if request.user.passport_photo_url else "",
+            "selfie": job.selfie_image.url,
         }
 
         return render(request, self.template_name, context)
+
+
+class KYCJobStatusView(LoginRequiredMixin, View):
+    """Polled by the result page while the worker processes the job."""
+
+    def get(self, request, pk):
+
+        job = get_object_or_404(
+            KYCVerification.objects.only("status", "verified", "confidence", "user_id"),
+            pk=pk,
+            user=request.user,
+        )
+
+        return JsonResponse({
+            "status": job.status,
+            "finished": job.is_finished,
+            "verified": job.verified,
+            "confidence": job.confidence,
+        })
@@ -0,0 +1,123 @@
+"""
+Face verification worker.
+
+KYCVerification rows double as the job queue: the web request only stores
+the selfie and returns, a pool of `manage.py run_kyc_worker` processes claims
+queued rows, runs the face matcher (kyc/face.py) with the model kept warm in
+memory and writes the result back to the row and the user.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from kyc.face import get_face_matcher, precompute_reference_embeddings, reference_embedding
+from kyc.models import KYCVerification
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+REQUEUE_EVERY = 60  # seconds
+
+
+def requeue_stale_jobs(stale_after):
+    """Put back jobs whose worker died mid-verification, give up after MAX_ATTEMPTS."""
+    stale = KYCVerification.objects.filter(
+        status="processing",
+        started_at__lt=timezone.now() - stale_after,
+    )
+    stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status="failed", error="Verification worker stopped responding.", finished_at=timezone.now()
+    )
+    return stale.update(status="queued")
+
+
+def claim_next_job():
+    """
+    Claim the oldest queued job.
+
+    The conditional UPDATE makes the claim atomic across worker processes
+    on every database backend; losing the race just means trying the next row.
+    """
+    while True:
+        job_id = (
+            KYCVerification.objects.filter(status="queued")
+            .order_by("created_at")
+            .values_list("id", flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        claimed = KYCVerification.objects.filter(pk=job_id, status="queued").update(
+            status="processing",
+            started_at=timezone.now(),
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return KYCVerification.objects.select_related("user").get(pk=job_id)
+
+
+def run_job(job, matcher):
+    user = job.user
+    try:
+        # the passport embedding is cached, only the selfie is embedded per attempt
+        reference = reference_embedding(user, matcher)
+        result = matcher.compare(reference, matcher.represent(job.selfie_image.path))
+    except Exception as e:
+        logger.exception("KYC job %s failed", job.id)
+        job.status = "failed"
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at"])
+        return job
+
+    verified = result["verified"]
+    distance = result["distance"]
+
+    job.verified = verified
+    job.confidence = round((1 - distance) * 100, 2)
+    job.status = "done"
+    job.finished_at = timezone.now()
+    job.save(update_fields=["verified", "confidence", "status", "finished_at"])
+
+    # UPDATE USER KYC STATUS
+    if verified:
+        user.kyc_status = "verified"
+        user.kyc_verified_at = timezone.now()
+        # self verification, the user is their own verifier
+        user.kyc_verified_by = user
+        user.save(update_fields=["kyc_status", "kyc_verified_at", "kyc_verified_by"])
+    else:
+        user.kyc_status = "rejected"
+        user.save(update_fields=["kyc_status"])
+    return job
+
+
+def work(stop_event=None, poll_interval=1.0, stale_after=timedelta(minutes=10), once=False):
+    """Worker loop: load the model, then process jobs until told to stop."""
+    # build the model once per worker process
+    matcher = get_face_matcher()
+    matcher.warm_up()
+    logger.info("KYC worker ready")
+
+    next_requeue = 0
+    while stop_event is None or not stop_event.is_set():
+        close_old_connections()
+        if time.monotonic() >= next_requeue:
+            requeue_stale_jobs(stale_after)
+            next_requeue = time.monotonic() + REQUEUE_EVERY
+
+        job = claim_next_job()
+        if job is None:
+            # idle, embed passport photos uploaded since the last poll
+            if precompute_reference_embeddings(matcher):
+                continue
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+        run_job(job, matcher)
@@ -1,10 +1,47 @@
 from decimal import Decimal
 from django import forms
-from loans.models import Application, Document
-from core.models import SitePage
+from loans.models import Application, Document, LoanTypes
+from django.core.exceptions import ValidationError
+from django.forms.models import ModelChoiceIterator
+
+from core.config_cache import loan_types, site_settings
+
+
+class CachedLoanTypeIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for loan_type in loan_types():
+            yield self.choice(loan_type)
+
+    def __len__(self):
+        return len(loan_types()) + (self.field.empty_label is not None)
+
+
+class LoanTypeChoiceField(forms.ModelChoiceField):
+    """Loan type select rendered and validated from the config cache, no query either way."""
+
+    iterator = CachedLoanTypeIterator
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        for loan_type in loan_types():
+            if str(loan_type.pk) == str(value):
+                return loan_type
+        raise ValidationError(
+            self.error_messages["invalid_choice"],
+            code="invalid_choice",
+            params={"value": value},
+        )
 
 
 class ApplicationForm(forms.ModelForm):
+    loan_type = LoanTypeChoiceField(
+        queryset=LoanTypes.objects.all(),
+        widget=forms.Select(attrs={"class": "form-control"}),
+    )
+
     class Meta:
         model = Application
         fields = [
@@ -25,6 +62,12 @@ class ApplicationForm(forms.ModelForm):
             "monthly_income": forms.NumberInput(attrs={"class": "form-control"}),
         }
 
+    def _get_validation_exclusions(self):
+        # LoanTypeChoiceField already found the row, skip the model's FK existence query
+        exclude = super()._get_validation_exclusions()
+        exclude.add("loan_type")
+        return exclude
+
     def clean(self):
         """
         The loan amount must not exceed 50% of the declared monthly salary.
@@ -34,7 +77,7 @@ class ApplicationForm(forms.ModelForm):
         cleaned_data = super().clean()
         amount = cleaned_data.get("amount")
         monthly_income = cleaned_data.get("monthly_income")
-        site = SitePage.objects.first()
+        site = site_settings()
 
         if amount is not None and monthly_income is not None:
             # Use Decimal for safe comparison
@@ -0,0 +1,65 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import User
+from loans.models import Application, ApprovedLoans, LoanTypes
+from loans.utils import create_repayments
+
+
+class Command(BaseCommand):
+    help = "Approve throwaway loans of different tenures and report query count and wall time of the schedule generation."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tenures", nargs="+", type=int, default=[12, 120, 360])
+        parser.add_argument("--method", choices=["flat", "reducing"], default=None)
+
+    def handle(self, *args, **options):
+        # everything is rolled back, the benchmark never leaves rows behind
+        with transaction.atomic():
+            officer = User.objects.create_user(
+                email="benchmark-officer@greenloan.local",
+                full_name="Benchmark Officer",
+                role="senior_officer",
+            )
+            loan_type = LoanTypes.objects.create(
+                name="Benchmark Loan",
+                description="benchmark",
+                interest_rate=Decimal("12.00"),
+                amount_limit=Decimal("10000000"),
+            )
+
+            for tenure in options["tenures"]:
+                application = Application.objects.create(
+                    applicant=officer,
+                    loan_type=loan_type,
+                    amount=Decimal("1000000"),
+                    duration_months=tenure,
+                    purpose="benchmark",
+                    monthly_income=Decimal("100000"),
+                    address="benchmark",
+                    citizenship_number="0000",
+                    status="approved",
+                )
+                loan = ApprovedLoans.objects.create(
+                    application=application,
+                    principle=application.amount,
+                    interest_rate=loan_type.interest_rate,
+                    tenure_months=tenure,
+                    approved_by=officer,
+                    status="active",
+                )
+
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    create_repayments(loan, method=options["method"])
+                    elapsed = (time.perf_counter() - start) * 1000
+
+                self.stdout.write(
+                    f"{tenure:>4} months: {len(queries):>3} queries, {elapsed:8.2f} ms"
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from simple_history.utils import bulk_update_with_history
+
+from loans.models import Repayment
+
+
+class Command(BaseCommand):
+    help = "Re-derive Repayment.amount_paid from the Payment rows and report (or fix) any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Write the re-derived totals back.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        # one aggregate query, the comparison runs in the HAVING clause
+        drifted = (
+            Repayment.objects.with_payments_total()
+            .exclude(amount_paid=F("payments_total"))
+            .order_by("id")
+        )
+
+        fixed = []
+        for repayment in drifted.iterator(chunk_size=options["batch_size"]):
+            self.stdout.write(
+                f"Repayment #{repayment.id}: stored {repayment.amount_paid}, "
+                f"payments {repayment.payments_total}"
+            )
+            if options["fix"]:
+                repayment.amount_paid = repayment.payments_total
+                repayment.apply_status()
+                fixed.append(repayment)
+
+        if fixed:
+            with transaction.atomic():
+                # history rows are written in batches too, so the fix stays auditable
+                bulk_update_with_history(
+                    fixed,
+                    Repayment,
+                    ["amount_paid", "status"],
+                    batch_size=options["batch_size"],
+                    default_change_reason="reconcile_repayments",
+                )
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(fixed)} repayments."))
+        elif options["fix"]:
+            self.stdout.write(self.style.SUCCESS("No drift found."))
+        else:
+            self.stdout.write("Checked, run with --fix to correct any drift reported above.")
@@ -0,0 +1,97 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from django.utils.dateparse import parse_datetime
+
+
+BATCH_SIZE = 500
+
+
+def explode_status_history(apps, schema_editor):
+    """Turn every status_history JSON entry into an ApplicationEvent row."""
+    Application = apps.get_model("loans", "Application")
+    ApplicationEvent = apps.get_model("loans", "ApplicationEvent")
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+
+    def flush(entries):
+        user_ids = {entry.get("user_id") for _, entry in entries}
+        existing = set(User.objects.filter(pk__in=user_ids).values_list("pk", flat=True))
+        ApplicationEvent.objects.bulk_create(
+            [
+                ApplicationEvent(
+                    application_id=application.pk,
+                    status=(entry.get("status") or "")[:20],
+                    actor_id=entry.get("user_id") if entry.get("user_id") in existing else None,
+                    note=entry.get("note") or "",
+                    created_at=parse_datetime(entry.get("timestamp") or "") or application.updated_at,
+                )
+                for application, entry in entries
+            ]
+        )
+
+    entries = []
+    applications = Application.objects.exclude(status_history=[]).only("id", "status_history", "updated_at")
+    for application in applications.iterator(chunk_size=BATCH_SIZE):
+        entries.extend((application, entry) for entry in application.status_history or [])
+        if len(entries) >= BATCH_SIZE:
+            flush(entries)
+            entries = []
+    if entries:
+        flush(entries)
+
+
+def rebuild_status_history(apps, schema_editor):
+    Application = apps.get_model("loans", "Application")
+    ApplicationEvent = apps.get_model("loans", "ApplicationEvent")
+
+    history = {}
+    for event in ApplicationEvent.objects.select_related("actor").order_by("application_id", "created_at", "id").iterator():
+        history.setdefault(event.application_id, []).append(
+            {
+                "status": event.status,
+                "user": event.actor.email if event.actor else "",
+                "user_id": event.actor_id,
+                "timestamp": event.created_at.isoformat(),
+                "note": event.note,
+            }
+        )
+    for application_id, entries in history.items():
+        Application.objects.filter(pk=application_id).update(status_history=entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('loans', '0021_historicalrepayment_amount_paid_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20)),
+                ('note', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='loans.application')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['application', 'created_at'], name='application_timeline_idx')],
+            },
+        ),
+        migrations.RunPython(explode_status_history, rebuild_status_history),
+        migrations.RemoveField(
+            model_name='application',
+            name='status_history',
+        ),
+        migrations.RemoveField(
+            model_name='historicalapplication',
+            name='status_history',
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:21
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0022_applicationevent'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='historicalapplication',
+            name='comments',
+        ),
+        migrations.RemoveField(
+            model_name='historicalapplication',
+            name='updated_at',
+        ),
+        migrations.RemoveField(
+            model_name='historicalcreditscore',
+            name='last_updated',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0024_historical_changes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='approvedloans',
+            index=models.Index(fields=['application', 'approved_at'], name='loan_latest_per_app_idx'),
+        ),
+    ]
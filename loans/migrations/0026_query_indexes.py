@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0025_approvedloans_latest_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['applicant', '-created_at'], name='application_applicant_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['-created_at'], name='application_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repayment',
+            index=models.Index(fields=['loan', 'status', 'due_date'], name='repayment_schedule_idx'),
+        ),
+    ]
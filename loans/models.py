@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import connections, models
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from simple_history.models import HistoricalRecords
+from django.db.models import F, Sum, Value, Window
+from django.db.models.functions import Coalesce, RowNumber
+from django.utils import timezone
+from core.history import HistoricalRecords
 
 from accounts.models import User
 
@@ -75,13 +78,18 @@ class Application(models.Model):
         blank=True,
         related_name="assigned_applications",
     )
-    status_history = models.JSONField(default=list)
     comments = models.JSONField(default=list)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # customer dashboard: own applications, newest first
+            models.Index(fields=["applicant", "-created_at"], name="application_applicant_idx"),
+            # staff dashboards: latest applications
+            models.Index(fields=["-created_at"], name="application_created_idx"),
+        ]
 
     def __str__(self):
         return f"Application {self.id} - {self.applicant.email}"
@@ -97,21 +105,43 @@ class Application(models.Model):
             raise ValidationError("Loan amount must be positive")
 
     def add_status_history(self, status, user, note=""):
-        """Add entry to status history"""
-        from django.utils import timezone
-
-        self.status_history.append(
-            {
-                "status": status,
-                "user": user.get_username(),
-                "user_id": user.id,
-                "timestamp": timezone.now().isoformat(),
-                "note": note,
-            }
+        """Append an entry to the timeline, a single INSERT that leaves the application row alone."""
+        return ApplicationEvent.objects.create(
+            application=self, status=status, actor=user, note=note
         )
-        self.save(update_fields=["status_history"])
     
-    history = HistoricalRecords()
+    history = HistoricalRecords(excluded_fields=["comments", "updated_at"])
+
+
+class ApplicationEvent(models.Model):
+    """
+    One entry of an application's status timeline. Rows are only ever
+    inserted, the (application, created_at) index serves the timeline.
+    """
+
+    application = models.ForeignKey(
+        Application, on_delete=models.CASCADE, related_name="events"
+    )
+    # application statuses, plus verified / rejected for document decisions
+    status = models.CharField(max_length=20)
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    note = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["created_at", "id"]
+        indexes = [
+            models.Index(fields=["application", "created_at"], name="application_timeline_idx"),
+        ]
+
+    def __str__(self):
+        return f"Application {self.application_id} {self.status}"
 
 
 class Document(models.Model):
@@ -149,6 +179,26 @@ class Document(models.Model):
     class Meta:
         unique_together = ("application","document_type","verification_status")
 
+class ApprovedLoansQuerySet(models.QuerySet):
+    def latest_per_application(self):
+        """The most recently approved loan of each application, newest first, in one query."""
+        if connections[self.db].features.can_distinct_on_fields:
+            latest = self.order_by("application_id", "-approved_at", "-id").distinct("application_id")
+            return self.filter(pk__in=latest.values("pk")).order_by("-approved_at", "-id")
+        # no DISTINCT ON (SQLite, MySQL): keep the first row of each application's window
+        return (
+            self.annotate(
+                application_rank=Window(
+                    RowNumber(),
+                    partition_by=F("application_id"),
+                    order_by=[F("approved_at").desc(), F("id").desc()],
+                )
+            )
+            .filter(application_rank=1)
+            .order_by("-approved_at", "-id")
+        )
+
+
 class ApprovedLoans(models.Model):
     application = models.ForeignKey(Application, on_delete=models.CASCADE)
     principle = models.DecimalField(max_digits=12, decimal_places=2)
@@ -162,15 +212,35 @@ class ApprovedLoans(models.Model):
         ("defaulted","Defaulted"),
     ])
 
+    objects = ApprovedLoansQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["application", "approved_at"], name="loan_latest_per_app_idx"),
+        ]
+
     def __str__(self):
         return f"Loan #{self.id}- {self.application.applicant.full_name}"
     
     history = HistoricalRecords()
     
+class RepaymentQuerySet(models.QuerySet):
+    def with_payments_total(self):
+        """Annotate the paid total re-derived from Payment rows in the same query."""
+        return self.annotate(
+            payments_total=Coalesce(
+                Sum("payments__amount"),
+                Value(0),
+                output_field=models.DecimalField(max_digits=16, decimal_places=2),
+            )
+        )
+
+
 class Repayment(models.Model):
     loan = models.ForeignKey(ApprovedLoans, on_delete=models.CASCADE, related_name="repayments")
     due_date = models.DateField()
     paid_date = models.DateField(null=True, blank=True)
+    # running total of the related payments, written together with each Payment
     amount_paid = models.DecimalField(max_digits=16, decimal_places=2, default=0)
     amount_due = models.DecimalField(max_digits=12, decimal_places=2)
     status = models.CharField(
@@ -184,36 +254,51 @@ class Repayment(models.Model):
         default="pending",
     )
 
+    objects = RepaymentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["loan", "status", "due_date"], name="repayment_schedule_idx"),
+        ]
+
     def is_late(self):
         return self.paid_date and self.paid_date > self.due_date
     def total_paid(self):
-        return sum(p.amount for p in self.payments.all())
+        return self.amount_paid or 0
 
     def remaining_amount(self):
         return self.amount_due - self.total_paid()
 
-    def update_status(self):
+    def apply_status(self):
+        """Derive status from the denormalized paid total, without saving."""
         paid = self.total_paid()
 
-        if paid == 0:
+        if paid <= 0:
             self.status = "pending"
         elif paid < self.amount_due:
             self.status = "partial"
+        elif self.is_late():
+            self.status = "late"
         else:
             self.status = "paid"
 
+    def update_status(self):
+        self.apply_status()
         self.save(update_fields=["status"])
     
     history = HistoricalRecords()
 
 class CreditScore(models.Model):
+    MIN_SCORE = 300
+    MAX_SCORE = 900
+
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    score = models.IntegerField(default=300)  # start from 300
+    score = models.IntegerField(default=MIN_SCORE)  # start from the bottom
     last_updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.user.full_name} - {self.score}"
     
-    history = HistoricalRecords()
+    history = HistoricalRecords(excluded_fields=["last_updated"])
     
 
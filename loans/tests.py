@@ -1,3 +1,300 @@
-from django.test import TestCase
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import User
+from core.testing import QueryBudgetMixin
+from loans.models import Application, ApplicationEvent, ApprovedLoans, CreditScore, Document, LoanTypes, Repayment
+from loans.utils import add_months, apply_credit_score_delta, build_repayment_schedule
+from payments.models import Payment
+
+
+class RepaymentScheduleTests(SimpleTestCase):
+    def amounts(self, schedule, key="amount_due"):
+        return [row[key] for row in schedule]
+
+    def test_flat_interest_is_charged_on_the_original_principal(self):
+        schedule = build_repayment_schedule(Decimal("100000"), Decimal("12"), 12, date(2024, 1, 15), "flat")
+
+        self.assertEqual(sum(self.amounts(schedule)), Decimal("112000.00"))
+        self.assertEqual(sum(self.amounts(schedule, "interest")), Decimal("12000.00"))
+        self.assertEqual(set(self.amounts(schedule)[:-1]), {Decimal("9333.33")})
+        self.assertEqual(schedule[-1]["amount_due"], Decimal("9333.37"))
+
+    def test_reducing_balance_pays_the_emi(self):
+        schedule = build_repayment_schedule(Decimal("100000"), Decimal("12"), 12, date(2024, 1, 15), "reducing")
+
+        self.assertEqual(set(self.amounts(schedule)[:-1]), {Decimal("8884.88")})
+        self.assertEqual(sum(self.amounts(schedule, "principal")), Decimal("100000"))
+        self.assertEqual(sum(self.amounts(schedule, "interest")), Decimal("6618.53"))
+        # interest falls as the balance does
+        self.assertEqual(schedule[0]["interest"], Decimal("1000.00"))
+        self.assertLess(schedule[-1]["interest"], schedule[-2]["interest"])
+
+    def test_last_instalment_absorbs_the_rounding(self):
+        for method in ("flat", "reducing"):
+            with self.subTest(method=method):
+                schedule = build_repayment_schedule(Decimal("10000"), Decimal("10"), 7, date(2024, 1, 15), method)
+
+                self.assertEqual(schedule[-1]["balance"], Decimal("0"))
+                self.assertEqual(sum(self.amounts(schedule, "principal")), Decimal("10000"))
+                self.assertEqual(
+                    sum(self.amounts(schedule)),
+                    sum(self.amounts(schedule, "principal")) + sum(self.amounts(schedule, "interest")),
+                )
+                self.assertTrue(all(amount == amount.quantize(Decimal("0.01")) for amount in self.amounts(schedule)))
+
+    def test_zero_rate_splits_the_principal(self):
+        for method in ("flat", "reducing"):
+            with self.subTest(method=method):
+                schedule = build_repayment_schedule(Decimal("1000"), Decimal("0"), 3, date(2024, 1, 15), method)
+
+                self.assertEqual(self.amounts(schedule), [Decimal("333.33"), Decimal("333.33"), Decimal("333.34")])
+                self.assertEqual(set(self.amounts(schedule, "interest")), {Decimal("0")})
+                self.assertEqual(schedule[-1]["balance"], Decimal("0"))
+
+    def test_month_ends_are_clamped(self):
+        self.assertEqual(add_months(date(2023, 1, 31), 1), date(2023, 2, 28))
+        self.assertEqual(add_months(date(2024, 1, 31), 1), date(2024, 2, 29))
+        self.assertEqual(add_months(date(2024, 11, 30), 3), date(2025, 2, 28))
+
+        # each due date is counted from the start, so a short month does not pull the later ones back
+        schedule = build_repayment_schedule(Decimal("3000"), Decimal("10"), 3, date(2024, 1, 31))
+        self.assertEqual(self.amounts(schedule, "due_date"), [date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)])
+
+    def test_invalid_input_is_rejected(self):
+        with self.assertRaises(ValueError):
+            build_repayment_schedule(Decimal("1000"), Decimal("10"), 0, date(2024, 1, 15))
+        with self.assertRaises(ValueError):
+            build_repayment_schedule(Decimal("1000"), Decimal("10"), 12, date(2024, 1, 15), "compound")
+
+
+class CreditScoreTests(TestCase):
+    def test_scores_stay_within_the_bounds(self):
+        user = User.objects.create_user(email="score@example.com")
+
+        self.assertEqual(apply_credit_score_delta(user, -30).score, CreditScore.MIN_SCORE)
+        for _ in range(70):
+            apply_credit_score_delta(user, 10)
+        self.assertEqual(CreditScore.objects.get(user=user).score, CreditScore.MAX_SCORE)
+
+
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class LandingPageQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.officer = User.objects.create_user(
+            email="officer@greenloan.local", password="pass", role="loan_officer"
+        )
+        loan_type = LoanTypes.objects.create(
+            name="Green", description="test", interest_rate=Decimal("10"), amount_limit=Decimal("100000")
+        )
+        application = Application.objects.create(
+            applicant=cls.officer,
+            loan_type=loan_type,
+            amount=Decimal("1000"),
+            duration_months=12,
+            purpose="test",
+            monthly_income=Decimal("5000"),
+            address="test",
+            citizenship_number="1",
+        )
+        loan = ApprovedLoans.objects.create(
+            application=application,
+            principle=Decimal("1000"),
+            interest_rate=Decimal("10"),
+            tenure_months=12,
+            approved_by=cls.officer,
+            status="active",
+        )
+        paid = date(2024, 1, 1)
+        for i in range(30):
+            paid_date = paid + timedelta(days=i * 20)
+            repayment = Repayment.objects.create(
+                loan=loan,
+                due_date=paid,
+                paid_date=paid_date,
+                amount_due=Decimal("100"),
+                amount_paid=Decimal("100"),
+                status="paid",
+            )
+            payment = Payment.objects.create(repayment=repayment, amount=Decimal("100"), method="cash")
+            Payment.objects.filter(pk=payment.pk).update(
+                paid_at=datetime.combine(paid_date, time(12), tzinfo=dt_timezone.utc)
+            )
+        # paid_at was rewritten behind the signals' back
+        call_command("backfill_portfolio_stats", stdout=StringIO())
+
+    def setUp(self):
+        self.client.force_login(self.officer)
+
+    def landing_queries(self, start, end):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("loans:landing"), {"range": "custom", "start": start, "end": end}
+            )
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.context["staticdata"]
+
+    def test_query_count_does_not_grow_with_range(self):
+        short_count, short = self.landing_queries("2024-01-01", "2024-01-07")
+        long_count, long = self.landing_queries("2020-01-01", "2025-12-31")
+
+        self.assertEqual(short_count, long_count)
+        self.assertEqual(short["revenue_granularity"], "day")
+        self.assertEqual(long["revenue_granularity"], "month")
+        self.assertEqual(long["total_revenue"], Decimal("3000"))
+
+    def test_missing_buckets_are_zero_filled(self):
+        _, data = self.landing_queries("2024-01-01", "2024-01-31")
+
+        self.assertEqual(len(data["revenue_trend"]), 31)
+        amounts = {row["date"]: row["amount"] for row in data["revenue_trend"]}
+        self.assertEqual(amounts["2024-01-01"], Decimal("100"))
+        self.assertEqual(amounts["2024-01-02"], 0)
+        self.assertEqual(data["total_revenue"], Decimal("200"))
+
+
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class ApplicationTimelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.officer = User.objects.create_user(email="officer@greenloan.local", password="pass", role="officer")
+        cls.customer = User.objects.create_user(email="customer@greenloan.local", password="pass")
+        loan_type = LoanTypes.objects.create(
+            name="Green", description="test", interest_rate=Decimal("10"), amount_limit=Decimal("100000")
+        )
+        cls.application = Application.objects.create(
+            applicant=cls.customer,
+            loan_type=loan_type,
+            amount=Decimal("1000"),
+            duration_months=12,
+            purpose="test",
+            monthly_income=Decimal("5000"),
+            address="test",
+            citizenship_number="1",
+        )
+        cls.document = Document.objects.create(application=cls.application, document_type="salary_slip")
+
+    def setUp(self):
+        self.client.force_login(self.officer)
+
+    def test_document_decision_is_a_single_insert(self):
+        history = self.application.history.count()
+        with CaptureQueriesContext(connection) as queries:
+            self.application.add_status_history("verified", self.officer, "Salary slip verified")
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(self.application.history.count(), history)
+
+        self.client.post(
+            reverse("loans:document_approve_reject", args=[self.application.pk]),
+            {"document_id": self.document.pk, "action": "approve"},
+        )
+        self.assertEqual(self.application.history.count(), history)
+        self.assertEqual(self.application.events.count(), 2)
+
+    def test_timeline_is_one_query_however_long(self):
+        def timeline_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse("loans:application_detail", args=[self.application.pk]))
+            self.assertEqual(response.status_code, 200)
+            return len(queries), list(response.context["timeline"])
+
+        self.application.add_status_history("submitted", self.customer, "Application submitted")
+        short_count, _ = timeline_queries()
+
+        ApplicationEvent.objects.bulk_create(
+            [ApplicationEvent(application=self.application, status="under_review", actor=self.officer) for _ in range(20)]
+        )
+        long_count, timeline = timeline_queries()
+
+        self.assertEqual(short_count, long_count)
+        self.assertEqual(len(timeline), 21)
+        self.assertEqual(timeline[0].status, "submitted")
+        self.assertContains(self.client.get(reverse("loans:application_detail", args=[self.application.pk])), "Application submitted")
+
+
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class RepaymentQueryTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(email="customer@greenloan.local", password="pass")
+        cls.officer = User.objects.create_user(email="officer@greenloan.local", role="officer")
+        cls.loan = cls.make_loan()
+
+    @classmethod
+    def make_loan(cls):
+        loan_type = LoanTypes.objects.create(
+            name=f"Type {LoanTypes.objects.count()}",
+            description="test",
+            interest_rate=Decimal("10"),
+            amount_limit=Decimal("100000"),
+        )
+        application = Application.objects.create(
+            applicant=cls.customer,
+            loan_type=loan_type,
+            amount=Decimal("1200"),
+            duration_months=12,
+            purpose="test",
+            monthly_income=Decimal("5000"),
+            address="test",
+            citizenship_number="1",
+        )
+        return ApprovedLoans.objects.create(
+            application=application,
+            principle=Decimal("1200"),
+            interest_rate=Decimal("10"),
+            tenure_months=12,
+            approved_by=cls.officer,
+            status="active",
+        )
+
+    def seed_loans(self, n):
+        for _ in range(n):
+            self.make_loan()
+
+    def seed_repayments(self, n):
+        ids = [
+            Repayment.objects.create(loan=self.loan, due_date=date(2099, 1, 1), amount_due=Decimal("100")).id
+            for _ in range(n)
+        ]
+        session = self.client.session
+        session["selected_repayments"] = session.get("selected_repayments", []) + ids
+        session.save()
+
+    def setUp(self):
+        self.client.force_login(self.customer)
+
+    def test_loan_list(self):
+        self.assertQueryCountConstant(reverse("loans:repayment_list"), self.seed_loans)
+
+    def test_selected_loan_repayments(self):
+        self.assertQueryCountConstant(
+            reverse("loans:repayment_list"), self.seed_repayments, {"loan_id": self.loan.id}
+        )
+
+    def test_repayment_confirm(self):
+        self.assertQueryCountConstant(reverse("loans:repayment-confirm"), self.seed_repayments)
+
+    def test_only_the_latest_loan_of_each_application_is_listed(self):
+        reissued = ApprovedLoans.objects.create(
+            application=self.loan.application,
+            principle=Decimal("1500"),
+            interest_rate=Decimal("10"),
+            tenure_months=12,
+            approved_by=self.officer,
+            status="active",
+        )
+        other = self.make_loan()
+
+        response = self.client.get(reverse("loans:repayment_list"), {"loan_id": self.loan.id})
+
+        self.assertEqual(response.context["loans"], [other, reissued])
+        self.assertIsNone(response.context["selected_loan"])
@@ -1,44 +1,146 @@
 from loans.models import CreditScore, Repayment
-from loans.models import Repayment
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
-from datetime import timedelta
+from simple_history.utils import bulk_create_with_history
+from calendar import monthrange
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
 
-def update_credit_score(user, repayment):
-        credit, _ = CreditScore.objects.get_or_create(user=user)
+TWO_PLACES = Decimal("0.01")
+INTEREST_METHODS = ("flat", "reducing")
+
+def credit_score_delta(repayment):
+    """Score change earned by a repayment in its current state."""
+    if repayment.status == "paid" and not repayment.is_late():
+        return 10
+    elif repayment.status == "late" or (repayment.status == "paid" and repayment.is_late()):
+        return -15
+    elif repayment.status == "pending":
+        return -30
+    return 0
 
-        if repayment.status == "paid" and not repayment.is_late():
-            credit.score += 10
-        elif repayment.status == "paid" and repayment.is_late():
-            credit.score -= 15
-        elif repayment.status == "pending":
-            credit.score -= 30
+def clamp_credit_score(score):
+    return max(CreditScore.MIN_SCORE, min(CreditScore.MAX_SCORE, score))
 
-        credit.score = max(300, min(900, credit.score))
-        credit.save()
+def apply_credit_score_delta(user, delta):
+    # the row is locked until the caller's transaction ends, so two payments
+    # allocated at once for the same user both count; create with the new
+    # score rather than insert-then-update, and skip the save (and its history
+    # row) when the score is already at a bound
+    with transaction.atomic():
+        credit, created = CreditScore.objects.select_for_update().get_or_create(
+            user=user, defaults={"score": clamp_credit_score(CreditScore.MIN_SCORE + delta)}
+        )
+        score = clamp_credit_score(credit.score + delta)
+        if not created and score != credit.score:
+            credit.score = score
+            credit.save()
+    return credit
+
+def update_credit_score(user, repayment):
+    return apply_credit_score_delta(user, credit_score_delta(repayment))
 
 def close_loan_if_completed(loan):
     if not loan.repayments.filter(status="pending").exists():
         loan.status = "closed"
         loan.save()
 
-        credit, _ = CreditScore.objects.get_or_create(user=loan.user)
-        credit.score = min(900, credit.score + 20)
-        credit.save()
+        apply_credit_score_delta(loan.user, 20)
 
 
+def _money(value):
+    return value.quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
 
-def create_repayments(approved_loan):
+
+def add_months(start, months):
+    """Same day `months` later, clamped to the last day of the target month."""
+    month_index = start.month - 1 + months
+    year = start.year + month_index // 12
+    month = month_index % 12 + 1
+    return date(year, month, min(start.day, monthrange(year, month)[1]))
+
+
+def build_repayment_schedule(principal, annual_rate, tenure_months, start_date, method="reducing"):
     """
-    Generate monthly repayment schedule for an approved loan.
+    Compute the full amortization table in memory.
+
+    `flat` charges interest on the original principal for the whole tenure,
+    `reducing` is the standard EMI on the outstanding balance. Every amount is
+    rounded to paisa and the last instalment absorbs the rounding remainder,
+    so the schedule always sums to exactly principal + interest.
     """
-    monthly_amount = approved_loan.principle / approved_loan.tenure_months
-    today = timezone.now().date()
+    if method not in INTEREST_METHODS:
+        raise ValueError(f"Unknown interest method: {method}")
+    if tenure_months <= 0:
+        raise ValueError("Tenure must be at least one month")
 
-    for i in range(1, approved_loan.tenure_months + 1):
-        due_date = today + timedelta(days=30*i)
-        Repayment.objects.create(
+    principal = Decimal(principal)
+    monthly_rate = Decimal(annual_rate) / Decimal("1200")
+    n = tenure_months
+
+    if method == "flat":
+        total_interest = _money(principal * monthly_rate * n)
+        instalment = _money((principal + total_interest) / n)
+        interest_part = _money(total_interest / n)
+    elif monthly_rate:
+        growth = (1 + monthly_rate) ** n
+        instalment = _money(principal * monthly_rate * growth / (growth - 1))
+    else:
+        instalment = _money(principal / n)
+
+    schedule = []
+    balance = principal
+    interest_left = total_interest if method == "flat" else None
+    for i in range(1, n + 1):
+        if method == "flat":
+            interest = interest_left if i == n else interest_part
+            interest_left -= interest
+        else:
+            interest = _money(balance * monthly_rate)
+
+        if i == n:
+            principal_part = balance
+        else:
+            principal_part = min(instalment - interest, balance)
+        balance -= principal_part
+
+        schedule.append({
+            "installment": i,
+            "due_date": add_months(start_date, i),
+            "principal": principal_part,
+            "interest": interest,
+            "amount_due": principal_part + interest,
+            "balance": balance,
+        })
+    return schedule
+
+
+def create_repayments(approved_loan, method=None):
+    """
+    Generate monthly repayment schedule for an approved loan.
+
+    The whole table is computed up front and written with a single
+    bulk INSERT (plus one bulk INSERT for the history rows, unless
+    settings.HISTORY_REPAYMENT_SCHEDULE is off).
+    """
+    schedule = build_repayment_schedule(
+        approved_loan.principle,
+        approved_loan.interest_rate,
+        approved_loan.tenure_months,
+        timezone.now().date(),
+        method=method or settings.LOAN_INTEREST_METHOD,
+    )
+    repayments = [
+        Repayment(
             loan=approved_loan,
-            due_date=due_date,
-            amount_due=monthly_amount,
-            status="pending"
+            due_date=row["due_date"],
+            amount_due=row["amount_due"],
+            status="pending",
         )
+        for row in schedule
+    ]
+    if not settings.HISTORY_REPAYMENT_SCHEDULE:
+        return Repayment.objects.bulk_create(repayments, batch_size=500)
+    with transaction.atomic():
+        return bulk_create_with_history(repayments, Repayment, batch_size=500)
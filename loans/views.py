@@ -6,18 +6,22 @@ from django.views.generic import CreateView, DetailView, ListView, UpdateView, V
 from loans.forms import ApplicationForm, DocumentUploadForm
 from loans.models import Application, ApprovedLoans, Document, Repayment
 from django.contrib import messages
+from django.db import transaction
 from django.utils import timezone
-from loans.utils import create_repayments, update_credit_score
+from loans.utils import add_months, create_repayments, update_credit_score
 from loans.signals import loan_approved_signal, loan_reject_signal
 from datetime import date, datetime, timedelta
 from calendar import monthrange
-from django.db.models import Count, Sum, Q
+from django.db.models import Sum, Q
 from django.db.models import Case, When, Value, IntegerField
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
 from django.contrib.auth import get_user_model
 from calendar import month_name, monthrange
 from django.utils.text import capfirst
 
 from payments.models import Payment
+from core.models import DailyPortfolioStat
+from core.rollups import STAT_FIELDS, portfolio_totals
 
 User = get_user_model()
 
@@ -103,6 +107,8 @@ class ApplicationDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView)
             or self.request.user.role in ["customer", "officer", "senior_officer"]
         )
         context["all_document_types"] = Document.DOCUMENT_TYPES
+        # one range scan on application_timeline_idx
+        context["timeline"] = application.events.select_related("actor")
 
         context["all_doc_verified"] = True
 
@@ -289,13 +295,11 @@ class DocumentApproveReject(LoginRequiredMixin, UserPassesTestMixin, View):
 
         document.save(update_fields=["verification_status"])
 
-        if hasattr(application, "add_status_history"):
-            application.add_status_history(
-                status=document.verification_status,
-                user=request.user,
-                note=f"Document '{document}' {document.verification_status} by {request.user.username}",
-            )
-            application.save()
+        application.add_status_history(
+            status=document.verification_status,
+            user=request.user,
+            note=f"Document '{document}' {document.verification_status} by {request.user.username}",
+        )
 
         return redirect("loans:application_detail", pk=application.pk)
 
@@ -332,14 +336,15 @@ class ApplicationStatusUpdateView(LoginRequiredMixin, UserPassesTestMixin, View)
                     verification_status="",
                     defaults={"is_additional": True}
                 )
-                if additional_docs:
-                    application.status = "info_requested"
-                    application.add_status_history(
-                        status="info_requested",
-                        user=request.user,
-                        note="Officer requested additional documents"
-                    )
-                    application.save(update_fields=["status"])
+
+            if additional_docs:
+                application.status = "info_requested"
+                application.add_status_history(
+                    status="info_requested",
+                    user=request.user,
+                    note="Officer requested additional documents"
+                )
+                application.save(update_fields=["status"])
             
             messages.success(request, "Additional document request sent.")
             return redirect("loans:application_detail", pk=application_id)
@@ -364,21 +369,23 @@ class ApplicationStatusUpdateView(LoginRequiredMixin, UserPassesTestMixin, View)
 
         application.status = new_status
         application.save()
+        application.add_status_history(new_status, request.user)
         messages.success(
             request,
             f"Application status changed to '{application.get_status_display()}'.",
         )
         if new_status == "approved":
-            approved_loan = ApprovedLoans.objects.create(
-                application=application,
-                principle=application.amount,
-                interest_rate=application.loan_type.interest_rate,
-                tenure_months=application.duration_months,
-                approved_by = self.request.user,
-                status="active"
-            )
-            # generate repayments
-            create_repayments(approved_loan)
+            with transaction.atomic():
+                approved_loan = ApprovedLoans.objects.create(
+                    application=application,
+                    principle=application.amount,
+                    interest_rate=application.loan_type.interest_rate,
+                    tenure_months=application.duration_months,
+                    approved_by = self.request.user,
+                    status="active"
+                )
+                # generate repayments
+                create_repayments(approved_loan)
             
             loan_approved_signal.send(
                 sender=None,
@@ -405,20 +412,12 @@ class RepaymentListView(ListView):
     def get_queryset(self):
         loan_id = self.request.GET.get("loan_id")
         
-        # Get latest loan per application
-        loans_qs = ApprovedLoans.objects.filter(application__applicant=self.request.user).order_by("-approved_at")
-        latest_loans_dict = {}
-        for loan in loans_qs:
-            if loan.application_id not in latest_loans_dict:
-                latest_loans_dict[loan.application_id] = loan
-        loans = list(latest_loans_dict.values())
-
-        self.selected_loan = None
-        if loan_id:
-            for loan in loans:
-                if str(loan.id) == str(loan_id):
-                    self.selected_loan = loan
-                    break
+        loans = list(
+            ApprovedLoans.objects.filter(application__applicant=self.request.user)
+            .latest_per_application()
+            .select_related("application__loan_type", "application__applicant", "approved_by")
+        )
+        self.selected_loan = {str(loan.id): loan for loan in loans}.get(loan_id)
 
         if self.selected_loan:
             repayments = self.selected_loan.repayments.annotate(
@@ -535,41 +534,79 @@ class LandingPageView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
 
         return start, end, range_type
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-
-        start_date, end_date, range_type = self.get_date_range()
+    # -----------------------
+    # PORTFOLIO ROLLUP
+    # -----------------------
+    def get_trend_granularity(self, start, end):
+        days = (end - start).days + 1
+        if days <= 62:
+            return "day"
+        if days <= 366:
+            return "week"
+        return "month"
+
+    def get_portfolio(self, start_date, end_date):
+        """
+        One GROUP BY over the daily rollup, bucketed by the trend granularity.
+        Returns the zero-filled revenue trend and the counters summed over the range.
+        """
+        granularity = self.get_trend_granularity(start_date, end_date)
+        trunc = {"day": TruncDay, "week": TruncWeek, "month": TruncMonth}[granularity]
+
+        rows = (
+            DailyPortfolioStat.objects
+            .filter(date__range=(start_date, end_date))
+            .annotate(bucket=trunc("date"))
+            .order_by()
+            .values("bucket")
+            .annotate(**{name: Sum(name) for name in STAT_FIELDS})
+        )
+        totals = dict.fromkeys(STAT_FIELDS, 0)
+        revenue = {}
+        for row in rows:
+            revenue[row["bucket"]] = row["revenue_collected"]
+            for name in STAT_FIELDS:
+                totals[name] += row[name] or 0
+
+        if granularity == "day":
+            bucket = start_date
+        elif granularity == "week":
+            bucket = start_date - timedelta(days=start_date.weekday())
+        else:
+            bucket = start_date.replace(day=1)
 
-        # ---------------- KPI ----------------
-        total_users = User.objects.exclude(role="customer").count()
+        revenue_trend = []
+        while bucket <= end_date:
+            revenue_trend.append({
+                "date": bucket.strftime("%Y-%m-%d"),
+                "amount": revenue.get(bucket) or 0
+            })
+            if granularity == "day":
+                bucket += timedelta(days=1)
+            elif granularity == "week":
+                bucket += timedelta(weeks=1)
+            else:
+                bucket = add_months(bucket, 1)
 
-        total_applications = Application.objects.filter(
-            created_at__date__range=(start_date, end_date)
-        ).count()
+        return revenue_trend, granularity, totals
 
-        approved_loans = ApprovedLoans.objects.filter(
-            approved_at__range=(start_date, end_date),
-            status="active"
-        ).count()
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
 
-        total_revenue = (
-            Repayment.objects.filter(
-                status="paid",
-                paid_date__range=(start_date, end_date)
-            )
-            .aggregate(total=Sum("amount_paid"))
-            .get("total") or 0
-        )
+        start_date, end_date, range_type = self.get_date_range()
+        revenue_trend, granularity, totals = self.get_portfolio(start_date, end_date)
+
+        # ---------------- Users & KYC ----------------
+        # users are bucketed by joined date, so the all time sum is the current state
+        all_time = portfolio_totals()
+        total_users = all_time["staff_users"]
+        kyc = {
+            "pending": all_time["kyc_pending"],
+            "verified": all_time["kyc_verified"],
+            "rejected": all_time["kyc_rejected"],
+        }
 
         # ---------------- Application Status ----------------
-        application_qs = (
-            Application.objects
-            .filter(created_at__date__range=(start_date, end_date))
-            .order_by()
-            .values("status")
-            .annotate(count=Count("id"))
-        )
-
         status_map = {
             "submitted": ("Submitted", "primary"),
             "under_review": ("Under Review", "warning"),
@@ -577,62 +614,34 @@ class LandingPageView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
             "rejected": ("Rejected", "danger"),
         }
 
+        total_applications = totals["applications_total"]
         application_status = [
             {
-                "label": status_map[row["status"]][0],
-                "count": row["count"],
-                "color": status_map[row["status"]][1],
+                "label": label,
+                "count": totals[f"applications_{status}"],
+                "color": color,
             }
-            for row in application_qs
-            if row["status"] in status_map
+            for status, (label, color) in status_map.items()
+            if totals[f"applications_{status}"]
         ]
 
-        # ---------------- KYC ----------------
-        kyc_qs = (
-            User.objects
-            .order_by()
-            .values("kyc_status")
-            .annotate(count=Count("id"))
-        )
-
-        kyc = {"pending": 0, "verified": 0, "rejected": 0}
-        for row in kyc_qs:
-            if row["kyc_status"] in kyc:
-                kyc[row["kyc_status"]] = row["count"]
-
         # ---------------- Loan Health ----------------
-        loan_qs = (
-            ApprovedLoans.objects
-            .filter(approved_at__range=(start_date, end_date))
-            .order_by()
-            .values("status")
-            .annotate(count=Count("id"))
-        )
-
         loan_map = {
             "active": "Active Loans",
             "closed": "Closed Loans",
             "defaulted": "Defaulted Loans",
         }
 
+        approved_loans = totals["loans_active"]
         loan_health = [
-            {"title": loan_map[row["status"]], "value": row["count"]}
-            for row in loan_qs
-            if row["status"] in loan_map
+            {"title": title, "value": totals[f"loans_{status}"]}
+            for status, title in loan_map.items()
+            if totals[f"loans_{status}"]
         ]
-        # ---------------- Revenue Trend ----------------
-        revenue_trend = []
-        current_day = start_date
-        while current_day <= end_date:
-            day_total = Repayment.objects.filter(
-                status="paid",
-                paid_date=current_day
-            ).aggregate(total=Sum("amount_paid")).get("total") or 0
-            revenue_trend.append({
-                "date": current_day.strftime("%Y-%m-%d"),
-                "amount": day_total
-            })
-            current_day += timedelta(days=1)
+
+        # ---------------- Revenue ----------------
+        total_revenue = totals["revenue_collected"]
+
         # ---------------- Context ----------------
         context["staticdata"] = {
             "total_users": total_users,
@@ -642,7 +651,8 @@ class LandingPageView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
             "application_status": application_status,
             "kyc": kyc,
             "loan_health": loan_health,
-            "revenue_trend": revenue_trend
+            "revenue_trend": revenue_trend,
+            "revenue_granularity": granularity,
         }
 
         context["filters"] = {
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='esewapayment',
+            name='repayment_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AlterField(
+            model_name='esewapayment',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('SUCCESS', 'Success'), ('FAILURE', 'Failure'), ('REVIEW', 'Needs review')], default='PENDING', max_length=20),
+        ),
+    ]
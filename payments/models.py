@@ -10,7 +10,9 @@ class EsewaPayment(models.Model):
     amount = models.DecimalField(max_digits=16, decimal_places=2)
     product_code = models.CharField(max_length=50)
     transaction_uuid = models.CharField(max_length=100, unique=True)
-    status = models.CharField(max_length=20, choices=(("PENDING","Pending"),("SUCCESS","Success"),("FAILURE","Failure"),), default="PENDING",)
+    status = models.CharField(max_length=20, choices=(("PENDING","Pending"),("SUCCESS","Success"),("FAILURE","Failure"),("REVIEW","Needs review"),), default="PENDING",)
+    # the instalments the payment was started for, allocated when eSewa confirms it
+    repayment_ids = models.JSONField(default=list, blank=True)
     ref_id = models.CharField(max_length=100, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -0,0 +1,168 @@
+import base64
+import hashlib
+import hmac
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from simple_history.utils import bulk_update_with_history
+
+from core.rollups import bump, local_day
+from loans.models import Repayment
+from loans.utils import apply_credit_score_delta, credit_score_delta
+from payments.models import EsewaPayment, Payment
+
+
+def allocate_payment(user, repayment_ids, amount, method, reference=None):
+    """
+    Spread `amount` over the user's selected repayments, oldest due date first.
+
+    Everything runs in one transaction with the repayment rows locked, so two
+    concurrent callbacks for the same instalments cannot both allocate against
+    the same remaining balance. Allocations are computed in memory and written
+    with one bulk UPDATE, one bulk INSERT of payments and one credit-score
+    update, so the query count does not depend on the number of instalments.
+
+    `amount=None` pays every selected instalment in full. `reference` may be a
+    string or a callable returning one per payment. Returns the created payments.
+    """
+    today = timezone.now().date()
+
+    with transaction.atomic():
+        repayments = list(
+            Repayment.objects.filter(
+                id__in=repayment_ids,
+                loan__application__applicant=user,
+            )
+            .select_for_update(of=("self",))
+            .order_by("due_date", "id")
+        )
+
+        remaining_amount = (
+            Decimal(amount) if amount is not None else sum(r.remaining_amount() for r in repayments)
+        )
+
+        updated = []
+        payments = []
+        score_delta = 0
+        for repayment in repayments:
+            if remaining_amount <= 0:
+                break
+
+            remaining = repayment.remaining_amount()
+            if remaining <= 0:
+                continue
+
+            payment_for_this = min(remaining_amount, remaining)
+
+            # amount_paid is the running total of the repayment's payments
+            repayment.amount_paid += payment_for_this
+            repayment.paid_date = today
+            repayment.apply_status()
+            score_delta += credit_score_delta(repayment)
+
+            updated.append(repayment)
+            payments.append(
+                Payment(
+                    repayment=repayment,
+                    amount=payment_for_this,
+                    method=method,
+                    reference=reference() if callable(reference) else reference,
+                )
+            )
+            remaining_amount -= payment_for_this
+
+        if not updated:
+            return []
+
+        bulk_update_with_history(
+            updated, Repayment, ["amount_paid", "paid_date", "status"], default_user=user
+        )
+        Payment.objects.bulk_create(payments)
+        # bulk_create skips post_save, so the dashboard rollup is bumped here
+        bump(local_day(payments[0].paid_at), revenue_collected=sum(p.amount for p in payments))
+        if score_delta:
+            apply_credit_score_delta(user, score_delta)
+
+    return payments
+
+
+def esewa_signature(message):
+    """Base64 HMAC-SHA256 of `message` with the merchant secret, as eSewa expects."""
+    digest = hmac.new(
+        settings.ESEWA_SECRET_CODE.encode("utf-8"),
+        message.encode("utf-8"),
+        hashlib.sha256,
+    ).digest()
+    return base64.b64encode(digest).decode("utf-8")
+
+
+def verify_esewa_response(response):
+    """Check the signature eSewa puts on its decoded callback payload."""
+    signed_field_names = response.get("signed_field_names")
+    signature = response.get("signature")
+    if not signed_field_names or not signature:
+        return False
+    message = ",".join(
+        f"{name}={response.get(name, '')}" for name in signed_field_names.split(",")
+    )
+    return hmac.compare_digest(esewa_signature(message), str(signature))
+
+
+def process_esewa_success(response):
+    """
+    Apply a verified, COMPLETE eSewa callback exactly once.
+
+    The callback is matched on its signed transaction_uuid alone, so it is
+    applied even when the browser comes back without the session that started
+    the payment, and the amount goes to the instalments stored on the
+    EsewaPayment row when it was started. The row is claimed with a
+    conditional PENDING -> SUCCESS UPDATE in the same transaction as the
+    allocation, so retries, refreshes and concurrent deliveries of the same
+    transaction_uuid cost one indexed lookup and never allocate twice. If the
+    instalments were paid in the meantime and part of the amount cannot be
+    applied, the row is left as REVIEW for staff.
+
+    Returns "applied", "needs_review", "duplicate", "not_found" or "amount_mismatch".
+    """
+    esewa_payment = (
+        EsewaPayment.objects.filter(transaction_uuid=response.get("transaction_uuid"))
+        .select_related("user")
+        .only("id", "amount", "status", "repayment_ids", "user")
+        .first()
+    )
+    if esewa_payment is None:
+        return "not_found"
+    if esewa_payment.status != "PENDING":
+        return "duplicate"
+
+    try:
+        paid_amount = Decimal(str(response.get("total_amount", "")).replace(",", ""))
+    except InvalidOperation:
+        paid_amount = None
+    ref_id = response.get("ref_id")
+
+    with transaction.atomic():
+        if paid_amount != esewa_payment.amount:
+            EsewaPayment.objects.filter(pk=esewa_payment.pk, status="PENDING").update(
+                status="FAILURE", ref_id=ref_id
+            )
+            return "amount_mismatch"
+
+        claimed = EsewaPayment.objects.filter(pk=esewa_payment.pk, status="PENDING").update(
+            status="SUCCESS", ref_id=ref_id
+        )
+        if not claimed:
+            # a concurrent delivery of the same callback got here first
+            return "duplicate"
+
+        payments = allocate_payment(
+            esewa_payment.user, esewa_payment.repayment_ids, esewa_payment.amount, "esewa", reference=ref_id
+        )
+        if sum(payment.amount for payment in payments) < esewa_payment.amount:
+            # eSewa has the money but (part of) it paid nothing here
+            EsewaPayment.objects.filter(pk=esewa_payment.pk).update(status="REVIEW")
+            return "needs_review"
+
+    return "applied"
@@ -1,3 +1,178 @@
+import base64
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import User
+from loans.models import Application, ApprovedLoans, CreditScore, LoanTypes, Repayment
+from payments.models import EsewaPayment, Payment
+from payments.services import (
+    allocate_payment,
+    esewa_signature,
+    process_esewa_success,
+    verify_esewa_response,
+)
+
+
+class PaymentsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(email="customer@greenloan.local", password="pass")
+        officer = User.objects.create_user(email="officer@greenloan.local", role="loan_officer")
+        loan_type = LoanTypes.objects.create(
+            name="Green", description="test", interest_rate=Decimal("10"), amount_limit=Decimal("100000")
+        )
+        application = Application.objects.create(
+            applicant=cls.customer,
+            loan_type=loan_type,
+            amount=Decimal("2400"),
+            duration_months=24,
+            purpose="test",
+            monthly_income=Decimal("5000"),
+            address="test",
+            citizenship_number="1",
+        )
+        cls.loan = ApprovedLoans.objects.create(
+            application=application,
+            principle=Decimal("2400"),
+            interest_rate=Decimal("10"),
+            tenure_months=24,
+            approved_by=officer,
+            status="active",
+        )
+
+    def make_repayments(self, count):
+        return [
+            Repayment.objects.create(
+                loan=self.loan, due_date=date(2099, 1, 1), amount_due=Decimal("100")
+            ).id
+            for _ in range(count)
+        ]
+
+
+
+class AllocatePaymentTests(PaymentsTestCase):
+    def allocation_queries(self, repayment_ids):
+        with CaptureQueriesContext(connection) as queries:
+            allocate_payment(self.customer, repayment_ids, None, "cash")
+        return len(queries)
+
+    def test_query_count_is_constant(self):
+        # first payment of the day also creates the credit score and rollup rows
+        self.allocation_queries(self.make_repayments(1))
+        two = self.allocation_queries(self.make_repayments(2))
+        twenty_four = self.allocation_queries(self.make_repayments(24))
+
+        self.assertEqual(two, twenty_four)
+        self.assertEqual(Payment.objects.count(), 27)
+        self.assertFalse(Repayment.objects.exclude(status="paid").exists())
+        self.assertEqual(CreditScore.objects.get(user=self.customer).score, CreditScore.MIN_SCORE + 27 * 10)
+
+    def test_partial_amount_is_spread_in_due_date_order(self):
+        ids = self.make_repayments(3)
+
+        allocate_payment(self.customer, ids, Decimal("150"), "cash")
+
+        statuses = list(Repayment.objects.filter(id__in=ids).order_by("id").values_list("status", "amount_paid"))
+        self.assertEqual(statuses, [("paid", Decimal("100")), ("partial", Decimal("50")), ("pending", Decimal("0"))])
+
+    def test_repeated_allocation_does_not_overpay(self):
+        ids = self.make_repayments(2)
+
+        allocate_payment(self.customer, ids, Decimal("200"), "cash")
+        created = allocate_payment(self.customer, ids, Decimal("200"), "cash")
+
+        self.assertEqual(created, [])
+        self.assertEqual(Payment.objects.count(), 2)
+
+
+class EsewaCallbackTests(PaymentsTestCase):
+    def setUp(self):
+        self.repayment_ids = self.make_repayments(2)
+        EsewaPayment.objects.create(
+            user=self.customer,
+            amount=Decimal("200.00"),
+            product_code="EPAYTEST",
+            transaction_uuid="txn-1",
+            repayment_ids=self.repayment_ids,
+        )
+
+    def callback(self, **overrides):
+        response = {
+            "transaction_code": "000AWEO",
+            "status": "COMPLETE",
+            "total_amount": "200.0",
+            "transaction_uuid": "txn-1",
+            "product_code": "EPAYTEST",
+            "signed_field_names": "transaction_code,status,total_amount,transaction_uuid,product_code,signed_field_names",
+        }
+        response.update(overrides)
+        message = ",".join(f"{n}={response[n]}" for n in response["signed_field_names"].split(","))
+        response["signature"] = esewa_signature(message)
+        return response
+
+    def test_signature_is_verified(self):
+        response = self.callback()
+        self.assertTrue(verify_esewa_response(response))
+
+        response["total_amount"] = "1.0"
+        self.assertFalse(verify_esewa_response(response))
+
+    def test_repeated_delivery_allocates_once(self):
+        response = self.callback(ref_id="REF1")
+
+        self.assertEqual(process_esewa_success(response), "applied")
+        with self.assertNumQueries(1):
+            result = process_esewa_success(response)
+
+        self.assertEqual(result, "duplicate")
+        self.assertEqual(Payment.objects.count(), 2)
+        self.assertEqual(EsewaPayment.objects.get().status, "SUCCESS")
+
+    def test_amount_mismatch_does_not_allocate(self):
+        result = process_esewa_success(self.callback(total_amount="20.0"))
+
+        self.assertEqual(result, "amount_mismatch")
+        self.assertFalse(Payment.objects.exists())
+        self.assertEqual(EsewaPayment.objects.get().status, "FAILURE")
+
+    def test_callback_without_the_session_pays_the_stored_instalments(self):
+        data = base64.b64encode(json.dumps(self.callback(ref_id="REF1")).encode()).decode()
+
+        # a fresh client: logged out, no session from the payment request
+        response = self.client.get(reverse("payments:esewa-success"), {"data": data})
+
+        self.assertRedirects(response, reverse("loans:repayment_list"), fetch_redirect_response=False)
+        self.assertEqual(EsewaPayment.objects.get().status, "SUCCESS")
+        self.assertEqual(Payment.objects.filter(method="esewa").count(), 2)
+        self.assertFalse(Repayment.objects.filter(id__in=self.repayment_ids).exclude(status="paid").exists())
+
+    def test_already_paid_instalments_are_left_for_review(self):
+        allocate_payment(self.customer, self.repayment_ids, None, "cash")
+
+        result = process_esewa_success(self.callback(ref_id="REF1"))
+
+        self.assertEqual(result, "needs_review")
+        self.assertEqual(EsewaPayment.objects.get().status, "REVIEW")
+        self.assertFalse(Payment.objects.filter(method="esewa").exists())
+
+    def test_failure_redirect_does_not_undo_a_settled_payment(self):
+        process_esewa_success(self.callback(ref_id="REF1"))
+        self.client.force_login(self.customer)
+
+        self.client.get(reverse("payments:esewa-failure"), {"transaction_uuid": "txn-1"})
+
+        self.assertEqual(EsewaPayment.objects.get().status, "SUCCESS")
+
+    def test_failure_redirect_fails_a_pending_payment(self):
+        self.client.force_login(self.customer)
+
+        response = self.client.get(reverse("payments:esewa-failure"), {"transaction_uuid": "txn-1"})
 
-# Create your tests here.
+        self.assertRedirects(response, reverse("loans:repayment_list"), fetch_redirect_response=False)
+        self.assertEqual(EsewaPayment.objects.get().status, "FAILURE")
@@ -1,20 +1,22 @@
 import base64
 import json
 import uuid
-import hmac
-import hashlib
 from decimal import Decimal
 from django.urls import reverse
 from django.shortcuts import redirect, get_object_or_404, render
 from django.views.generic import ListView, View
 from django.contrib import messages
-from django.utils import timezone
 from django.conf import settings
 from greenloan import settings as appsettings
 import requests
 from loans.models import Repayment, ApprovedLoans
-from payments.models import EsewaPayment, Payment
-from loans.utils import update_credit_score
+from payments.models import EsewaPayment
+from payments.services import (
+    allocate_payment,
+    esewa_signature,
+    process_esewa_success,
+    verify_esewa_response,
+)
 
 User = settings.AUTH_USER_MODEL
 
@@ -33,61 +35,19 @@ class PaymentMethodView(View):
         
         
         # Process other payment methods as demo
-        repayments = Repayment.objects.filter(
-            id__in=repayment_ids,
-            loan__application__applicant=request.user
-        ).order_by("due_date")
-        
-        if total_amount:
-            payment_amount = Decimal(total_amount)
-        else:
-            payment_amount = sum(r.amount_due for r in repayments)
-        
-        for repayment in repayments:
-            if payment_amount <= 0:
-                break
-            
-            remaining = repayment.remaining_amount()
-            if remaining <= 0:
-                continue
-            
-            # Calculate payment for this repayment
-            payment_for_this = min(payment_amount, remaining)
-            
-            # Update repayment
-            if repayment.amount_paid is None:
-                repayment.amount_paid = 0
-            
-            repayment.amount_paid += payment_for_this
-            repayment.paid_date = timezone.now().date()
-            
-            # Update status
-            if repayment.amount_paid >= repayment.amount_due:
-                repayment.status = "paid" if repayment.paid_date <= repayment.due_date else "late"
-            else:
-                repayment.status = "partial"
-            
-            repayment.save(update_fields=["amount_paid", "paid_date", "status"])
-            
-            # Create payment record
-            Payment.objects.create(
-                repayment=repayment,
-                amount=payment_for_this,
-                method=payment_method,
-                reference=f"DEMO_{uuid.uuid4().hex[:8]}"
-            )
-            
-            # Update credit score
-            update_credit_score(request.user, repayment)
-            
-            # Reduce payment amount
-            payment_amount -= payment_for_this
-        
-            # Clear session
-            if 'selected_repayments' in request.session:
-                del request.session['selected_repayments']
-            if 'selected_amount' in request.session:
-                del request.session['selected_amount']
+        allocate_payment(
+            request.user,
+            repayment_ids,
+            Decimal(total_amount) if total_amount else None,
+            payment_method,
+            reference=lambda: f"DEMO_{uuid.uuid4().hex[:8]}",
+        )
+
+        # Clear session
+        if 'selected_repayments' in request.session:
+            del request.session['selected_repayments']
+        if 'selected_amount' in request.session:
+            del request.session['selected_amount']
             
         return redirect("loans:repayment_list")
     
@@ -124,26 +84,20 @@ class EsewaPaymentView(ListView):
             amount=amount,
             product_code=product_code,
             transaction_uuid=transaction_uuid,
-            status="PENDING"
+            status="PENDING",
+            repayment_ids=list(repayment_ids),
         )
         
         # Store payment info in session
         request.session['esewa_payment_id'] = esewa_payment.id
-        request.session['repayment_ids'] = repayment_ids
         
         # eSewa payment URL and parameters
         esewa_url = appsettings.ESEWA_PAYMENT_URL
         
-        secret_key = appsettings.ESEWA_SECRET_CODE 
         amount_str = format(amount,".2f")
         signed_field_names = "amount,total_amount,transaction_uuid,product_code"
         string_to_sign = f"amount={amount_str},total_amount={amount_str},transaction_uuid={transaction_uuid},product_code={product_code}"
-        hmac_sha256 = hmac.new(
-            secret_key.encode('utf-8'),
-            string_to_sign.encode('utf-8'),
-            hashlib.sha256
-        )
-        signature = base64.b64encode(hmac_sha256.digest()).decode("utf-8")
+        signature = esewa_signature(string_to_sign)
   
         # Prepare context for eSewa form
         context = {
@@ -178,76 +132,49 @@ class EsewaSuccessView(View):
             messages.error(request, "Failed to decode the data")
             return redirect("loans:repayment_list")
         
-        # Get eSewa payment record
+        if not verify_esewa_response(esewa_response):
+            messages.error(request, "Invalid eSewa signature.")
+            return redirect("loans:repayment_list")
 
         transaction_uuid = esewa_response.get('transaction_uuid')
-        product_code = esewa_response.get('product_code')
         total_amount = esewa_response.get('total_amount')
-        ref_id = esewa_response.get('ref_id')
         status = esewa_response.get('status')
         
         if status != "COMPLETE":
+            EsewaPayment.objects.filter(transaction_uuid=transaction_uuid, status="PENDING").update(status="FAILURE")
             messages.error(request, "eSewa payment not completed")
+            return redirect("loans:repayment_list")
         
-        # Process repayments
-        repayment_ids = request.session.get('repayment_ids', [])
-        repayments = Repayment.objects.filter(
-            id__in=repayment_ids,
-            loan__application__applicant=request.user
-        ).order_by("due_date")
-        
-        payment_amount = Decimal(total_amount)
-        
-        for repayment in repayments:
-            if payment_amount <= 0:
-                break
-            
-            remaining = repayment.remaining_amount()
-            if remaining <= 0:
-                continue
-            
-            # Calculate payment for this repayment
-            payment_for_this = min(payment_amount, remaining)
-            
-            # Update repayment
-            if repayment.amount_paid is None:
-                repayment.amount_paid = 0
-            
-            repayment.amount_paid += payment_for_this
-            repayment.paid_date = timezone.now().date()
-            
-            # Update status
-            if repayment.amount_paid >= repayment.amount_due:
-                repayment.status = "paid" if repayment.paid_date <= repayment.due_date else "late"
-            else:
-                repayment.status = "partial"
-            
-            repayment.save(update_fields=["amount_paid", "paid_date", "status"])
-            
-            # Create payment record
-            Payment.objects.create(
-                repayment=repayment,
-                amount=payment_for_this,
-                method="esewa",
-                reference=ref_id
-            )
-            
-            # Update credit score
-            update_credit_score(request.user, repayment)
-            
-            # Reduce payment amount
-            payment_amount -= payment_for_this
+        # Process repayments, only the first delivery of a transaction allocates,
+        # to the instalments stored when the payment was started
+        result = process_esewa_success(esewa_response)
+
+        if result == "not_found":
+            messages.error(request, "eSewa payment record not found.")
+            return redirect("loans:repayment_list")
+        if result == "amount_mismatch":
+            messages.error(request, "eSewa paid amount does not match the payment request.")
+            return redirect("loans:repayment_list")
+        if result == "duplicate":
+            messages.info(request, "This eSewa payment has already been processed.")
+            return redirect("loans:repayment_list")
         
         # Clear session
         if 'esewa_payment_id' in request.session:
             del request.session['esewa_payment_id']
-        if 'repayment_ids' in request.session:
-            del request.session['repayment_ids']
         if 'selected_repayments' in request.session:
             del request.session['selected_repayments']
         if 'selected_amount' in request.session:
             del request.session['selected_amount']
         
+        if result == "needs_review":
+            messages.warning(
+                request,
+                f"Payment of Rs. {total_amount} was received, but the selected instalments were already paid. "
+                "Our staff will review it.",
+            )
+            return redirect("loans:repayment_list")
+
         messages.success(request, f"Payment of Rs. {total_amount} successful via eSewa!")
         return redirect("loans:repayment_list")
 
@@ -260,22 +187,18 @@ class EsewaFailureView(View):
         product_code = request.GET.get('product_code')
         total_amount = request.GET.get('total_amount')
         
-        # Update eSewa payment status
-        try:
-            esewa_payment = EsewaPayment.objects.get(
+        # Update eSewa payment status, unless the success callback already
+        # settled it (SUCCESS or REVIEW)
+        if request.user.is_authenticated:
+            EsewaPayment.objects.filter(
                 transaction_uuid=transaction_uuid,
-                user=request.user
-            )
-            esewa_payment.status = "FAILURE"
-            esewa_payment.save()
-        except EsewaPayment.DoesNotExist:
-            pass
+                user=request.user,
+                status="PENDING",
+            ).update(status="FAILURE")
         
         # Clear session
         if 'esewa_payment_id' in request.session:
             del request.session['esewa_payment_id']
-        if 'repayment_ids' in request.session:
-            del request.session['repayment_ids']
         
         messages.error(request, "eSewa payment failed. Please try again.")
         return redirect("loans:repayment_list")